@@ -0,0 +1,489 @@
+import io
+import os
+import re
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+from pathlib import Path
+
+import translate
+from translate import SRTTranslator, estimate_tokens, format_srt_time
+from mock_server import MockAPIServer, MockBehaviour, answer_prompt
+
+# Exact token counts when tiktoken is installed, estimates otherwise
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken if available, else estimate them"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return estimate_tokens(text)
+
+
+def quiet_translator() -> SRTTranslator:
+    """Create a translator without printing its banner"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SRTTranslator()
+
+
+# =========================================================================
+# PROMPT BENCHMARK
+# =========================================================================
+
+def measure_prompts(translator: SRTTranslator, subtitles, mode: str):
+    """Build every chunk prompt in the given mode, returning (chunks, tokens, characters)"""
+    translator.prompt_mode = mode
+    chunks = translator.plan_chunks(subtitles)
+    tokens = 0
+    characters = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for chunk in chunks:
+            context = translator.create_context_text(chunk) if mode != "compact" else ""
+            json_data = translator.create_translation_json(chunk)
+            prompt = translator.build_translation_prompt(context, json_data, len(chunk))
+            tokens += count_tokens(prompt)
+            characters += len(prompt)
+    return len(chunks), tokens, characters
+
+
+def benchmark_prompts(srt_files):
+    """Compare prompt sizes of the full and compact prompt modes"""
+    translator = quiet_translator()
+    counter = "tiktoken cl100k_base" if _ENCODING is not None else "estimated"
+
+    print(f"\n{'='*70}")
+    print(f"📏 PROMPT SIZE BENCHMARK ({counter} tokens)")
+    print(f"{'='*70}")
+    print(f"{'File':<28}{'Cues':>6}{'Full':>11}{'Compact':>11}{'Saved':>8}")
+    print(f"{'─'*70}")
+
+    total_full = total_compact = 0
+    for srt_file in srt_files:
+        with contextlib.redirect_stdout(io.StringIO()):
+            subtitles = translator.parse_srt(srt_file)
+        if not subtitles:
+            print(f"{Path(srt_file).name:<28}  ❌ could not parse")
+            continue
+
+        _, full_tokens, _ = measure_prompts(translator, subtitles, "full")
+        _, compact_tokens, _ = measure_prompts(translator, subtitles, "compact")
+        total_full += full_tokens
+        total_compact += compact_tokens
+
+        saved = 1 - compact_tokens / full_tokens if full_tokens else 0
+        print(f"{Path(srt_file).name[:27]:<28}{len(subtitles):>6}"
+              f"{full_tokens:>11}{compact_tokens:>11}{saved:>8.0%}")
+
+    if total_full:
+        print(f"{'─'*70}")
+        print(f"{'TOTAL':<34}{total_full:>11}{total_compact:>11}"
+              f"{1 - total_compact / total_full:>8.0%}")
+    print(f"{'='*70}\n")
+    translator.close()
+
+
+# =========================================================================
+# SYNTHETIC SUBTITLES
+# =========================================================================
+
+WORDS = ("we", "need", "to", "go", "now", "where", "is", "the", "car", "I", "don't", "know",
+         "what", "you", "mean", "listen", "to", "me", "it's", "not", "safe", "here", "come",
+         "on", "they", "are", "coming", "back", "tonight", "please", "wait", "for", "him")
+REPEATED_LINES = ("Yeah.", "No.", "What?", "Okay.", "Thank you.", "Come on!", "Let's go.", "[MUSIC]")
+# Written with the Arabic yeh, like legacy cp1256 subtitles (cp1256 has no Persian yeh)
+PERSIAN_WORDS = ("ما", "بايد", "الان", "برويم", "ماشين", "کجاست", "نمي‌دانم", "منظورت", "چيست",
+                 "گوش", "کن", "اينجا", "امن", "نيست", "بيا", "آنها", "امشب", "برمي‌گردند", "لطفا", "صبر")
+
+
+def generate_srt(path: Path, cues: int, seed: int = 0, repeat_ratio: float = 0.15,
+                 multiline_ratio: float = 0.3, scene_gap_ratio: float = 0.05,
+                 persian: bool = False, encoding: str = 'utf-8', newline: str = '\n'):
+    """
+    Write a synthetic SRT file with realistic structure
+
+    A share of the cues are short repeated lines (exercising deduplication
+    and the translation memory), some span two lines, and occasional long
+    pauses mark scene changes for the chunk planner. `persian`, `encoding`
+    and `newline` produce files like those of Persian subtitle archives
+    (e.g. cp1256 with CRLF line endings).
+    """
+    rng = random.Random(seed)
+    words = PERSIAN_WORDS if persian else WORDS
+    position = 1000
+    with open(path, 'w', encoding=encoding, newline=newline) as f:
+        for index in range(1, cues + 1):
+            if rng.random() < repeat_ratio and not persian:
+                text = rng.choice(REPEATED_LINES)
+            else:
+                lines = 2 if rng.random() < multiline_ratio else 1
+                text = "\n".join(
+                    " ".join(rng.choice(words) for _ in range(rng.randint(3, 8))).capitalize() + "."
+                    for _ in range(lines)
+                )
+            duration = rng.randint(900, 4000)
+            f.write(f"{index}\n{format_srt_time(position)} --> {format_srt_time(position + duration)}\n{text}\n\n")
+            gap = rng.randint(5000, 15000) if rng.random() < scene_gap_ratio else rng.randint(50, 1500)
+            position += duration + gap
+
+
+# =========================================================================
+# END-TO-END BENCHMARK
+# =========================================================================
+
+def combined_stats(servers) -> dict:
+    """Requests and status counts summed over all mock servers"""
+    total = {"requests": 0, "statuses": {}}
+    for server in servers:
+        stats = server.stats.snapshot()
+        total["requests"] += stats["requests"]
+        for code, count in stats["statuses"].items():
+            total["statuses"][code] = total["statuses"].get(code, 0) + count
+    return total
+
+
+def run_translation(servers, srt_file: Path, stream: bool = False):
+    """Translate one file against the mock servers, returning its measurements"""
+    translate.API_BACKENDS = [
+        {"name": f"mock{number}", "endpoint": server.url, "api_key": "mock"}
+        for number, server in enumerate(servers, 1)
+    ]
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        translator = SRTTranslator()
+        before = combined_stats(servers)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            if stream:
+                success = translator.translate_stream(str(srt_file), str(srt_file.with_suffix(".out.srt")))
+            else:
+                success = translator.translate(str(srt_file), str(srt_file.with_suffix(".out.srt")))
+        finally:
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        retries = translator.metrics.total("retries")
+        chunks = translator.metrics.total("chunks")
+        translator.close()
+
+    after = combined_stats(servers)
+    statuses = {code: count - before["statuses"].get(code, 0) for code, count in after["statuses"].items()}
+    return {
+        "success": success,
+        "seconds": elapsed,
+        "chunks": int(chunks),
+        "requests": after["requests"] - before["requests"],
+        "retries": int(retries),
+        "rate_limited": statuses.get(429, 0),
+        "server_errors": statuses.get(503, 0),
+        "peak_memory_mb": peak / 1_000_000
+    }
+
+
+def benchmark_runs(sizes, behaviour: MockBehaviour, stream=False, workers=None,
+                   retry_delay=None, backends=1, hedge=False, results_file=None):
+    """Translate synthetic files of each size against mock servers and report throughput"""
+    # Settings are read when a translator is created, so set them up front
+    translate.ENABLE_TRANSLATION_MEMORY = False  # Measure real requests, not cache hits
+    translate.ENABLE_CHECKPOINTS = False
+    translate.DEBUG_LOG_LEVEL = "off"
+    if workers:
+        translate.MAX_CONCURRENT_CHUNKS = workers
+    if retry_delay is not None:
+        translate.RETRY_DELAY = retry_delay
+    translate.HEDGE_REQUESTS = hedge
+
+    # Every mock backend shares the same behaviour (and its random failures)
+    servers = [MockAPIServer(behaviour=behaviour).start() for _ in range(max(1, backends))]
+    mode = "stream" if stream else "batch"
+    print(f"\n{'='*78}")
+    print(f"🏁 END-TO-END BENCHMARK ({mode} mode, {translate.MAX_CONCURRENT_CHUNKS} workers, "
+          f"{len(servers)} backend{'s' if len(servers) > 1 else ''}{', hedged' if hedge else ''}, "
+          f"mock latency {behaviour.latency}s)")
+    print(f"{'='*78}")
+    print(f"{'Cues':>7}{'Chunks':>8}{'Seconds':>9}{'Cues/s':>9}{'Requests':>10}"
+          f"{'Retries':>9}{'429s':>6}{'503s':>6}{'Peak MB':>9}  OK")
+    print(f"{'─'*78}")
+
+    results = []
+    original_dir = os.getcwd()
+    try:
+        for cues in sizes:
+            with tempfile.TemporaryDirectory() as work_dir:
+                os.chdir(work_dir)  # Keep logs, temp files and metrics out of the project
+                srt_file = Path(work_dir) / f"synthetic_{cues}.srt"
+                generate_srt(srt_file, cues)
+                result = run_translation(servers, srt_file, stream)
+                os.chdir(original_dir)
+
+            result["cues"] = cues
+            result["cues_per_second"] = cues / result["seconds"] if result["seconds"] else 0
+            results.append(result)
+            print(f"{cues:>7}{result['chunks']:>8}{result['seconds']:>9.2f}{result['cues_per_second']:>9.1f}"
+                  f"{result['requests']:>10}{result['retries']:>9}{result['rate_limited']:>6}"
+                  f"{result['server_errors']:>6}{result['peak_memory_mb']:>9.1f}  {'✅' if result['success'] else '❌'}")
+    finally:
+        os.chdir(original_dir)
+        for server in servers:
+            server.stop()
+
+    print(f"{'='*78}\n")
+    if results_file:
+        with open(results_file, 'w', encoding='utf-8') as f:
+            json.dump({"mode": mode, "workers": translate.MAX_CONCURRENT_CHUNKS,
+                       "backends": len(servers), "hedge": hedge,
+                       "behaviour": {k: v for k, v in vars(behaviour).items() if k not in ("random", "lock")},
+                       "results": results}, f, indent=2)
+        print(f"💾 Saved results: {results_file}")
+    return results
+
+
+# =========================================================================
+# PARSE BENCHMARK
+# =========================================================================
+
+PARSE_VARIANTS = {
+    "utf-8": {"encoding": "utf-8", "newline": "\n", "persian": False},
+    "utf-8-sig+crlf": {"encoding": "utf-8-sig", "newline": "\r\n", "persian": False},
+    "cp1256+crlf": {"encoding": "cp1256", "newline": "\r\n", "persian": True},
+}
+
+
+def parse_srt_dicts(srt_file: str):
+    """The previous parser (UTF-8 only, regex split into one dict per cue), as a baseline"""
+    with open(srt_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    subtitles = []
+    for block in re.split(r'\n\s*\n', content.strip()):
+        lines = block.strip().split('\n')
+        if len(lines) >= 3:
+            subtitles.append({'index': lines[0].strip(), 'time': lines[1].strip(), 'text': '\n'.join(lines[2:])})
+    return subtitles
+
+
+def timed(function, *args):
+    """Run once for the time, once more under tracemalloc for the peak memory"""
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    del result
+
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 1_000_000
+
+
+def benchmark_parse(megabytes, srt_files=None):
+    """Parse and write throughput of multi-MB SRT files, against the previous dict-based parser"""
+    translate.DEBUG_LOG_LEVEL = "off"
+    print(f"\n{'='*86}")
+    print(f"📖 SRT PARSE BENCHMARK")
+    print(f"{'='*86}")
+    print(f"{'File':<26}{'MB':>6}{'Cues':>9}{'Parse MB/s':>12}{'Peak MB':>9}"
+          f"{'Old MB/s':>10}{'Old peak':>10}{'Write MB/s':>12}  OK")
+    print(f"{'─'*86}")
+
+    original_dir = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)  # Keep logs and temp files out of the project
+            files = [Path(srt_file).resolve() for srt_file in srt_files or []]
+            for size in ([] if srt_files else megabytes):
+                for name, variant in PARSE_VARIANTS.items():
+                    path = Path(work_dir) / f"{size:g}MB_{name}.srt"
+                    # About 70 bytes per cue (a bit more in Persian)
+                    generate_srt(path, max(1, int(size * 1_000_000 / 70)), **variant)
+                    files.append(path)
+
+            translator = quiet_translator()
+            for path in files:
+                size = path.stat().st_size / 1_000_000
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cues, parse_seconds, parse_peak = timed(translator.parse_srt, str(path))
+                    try:
+                        old, old_seconds, old_peak = timed(parse_srt_dicts, str(path))
+                        old_result = f"{size / old_seconds:>10.1f}{old_peak:>10.1f}"
+                        same = len(old) == len(cues)
+                    except UnicodeDecodeError:
+                        old_result = f"{'fails':>10}{'-':>10}"
+                        same = True
+
+                    output = Path(work_dir) / "written.srt"
+                    started = time.perf_counter()
+                    translator.save_srt([(cue, cue.text) for cue in cues], str(output))
+                    write_seconds = time.perf_counter() - started
+
+                print(f"{path.name[:25]:<26}{size:>6.1f}{len(cues):>9}{size / parse_seconds:>12.1f}"
+                      f"{parse_peak:>9.1f}{old_result}{output.stat().st_size / 1_000_000 / write_seconds:>12.1f}"
+                      f"  {'✅' if cues and same else '❌'}")
+            translator.close()
+            os.chdir(original_dir)
+    finally:
+        os.chdir(original_dir)
+    print(f"{'='*86}\n")
+
+
+# =========================================================================
+# RESPONSE FORMAT BENCHMARK
+# =========================================================================
+
+def measure_responses(translator: SRTTranslator, subtitles, response_format: str):
+    """
+    Answer every chunk prompt like the mock does and parse the answers
+
+    Returns (chunks, response tokens, parse seconds, entries parsed).
+    """
+    translator.prompt_mode = "compact"
+    translator.response_format = response_format
+    chunks = translator.plan_chunks(subtitles)
+    tokens = 0
+    parse_seconds = 0.0
+    parsed = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for chunk in chunks:
+            prompt = translator.build_translation_prompt("", translator.create_translation_json(chunk), len(chunk))
+            response = answer_prompt(prompt)
+            tokens += count_tokens(response)
+
+            started = time.perf_counter()
+            parser = translator.create_response_parser()
+            parser.feed(response)
+            parsed += len(parser.close())
+            parse_seconds += time.perf_counter() - started
+    return len(chunks), tokens, parse_seconds, parsed
+
+
+def benchmark_formats(cues: int, behaviour: MockBehaviour, srt_files=None):
+    """Compare response tokens, parse cost and end-to-end latency per cue of each response format"""
+    translate.ENABLE_TRANSLATION_MEMORY = False
+    translate.ENABLE_CHECKPOINTS = False
+    translate.ADAPTIVE_CHUNK_SIZE = False  # Same chunk size rules for both formats
+    translate.DEBUG_LOG_LEVEL = "off"
+    translate.PROMPT_MODE = "compact"
+    counter = "tiktoken cl100k_base" if _ENCODING is not None else "estimated"
+
+    server = MockAPIServer(behaviour=behaviour).start()
+    print(f"\n{'='*78}")
+    print(f"🧾 RESPONSE FORMAT BENCHMARK ({counter} tokens, mock "
+          f"{behaviour.tokens_per_second or 'instant'} tokens/s, latency {behaviour.latency}s)")
+    print(f"{'='*78}")
+    print(f"{'File':<24}{'Format':>7}{'Chunks':>8}{'Tokens':>9}{'Tok/cue':>9}"
+          f"{'Parse µs/cue':>14}{'ms/cue':>9}  OK")
+    print(f"{'─'*78}")
+
+    original_dir = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)  # Keep logs, temp files and metrics out of the project
+            if not srt_files:
+                srt_files = [Path(work_dir) / f"synthetic_{cues}.srt"]
+                generate_srt(srt_files[0], cues)
+            translator = quiet_translator()
+
+            for srt_file in srt_files:
+                srt_file = Path(srt_file).resolve()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    subtitles = translator.parse_srt(str(srt_file))
+                if not subtitles:
+                    print(f"{srt_file.name:<24}  ❌ could not parse")
+                    continue
+
+                tokens_by_format = {}
+                for response_format in ("json", "lines"):
+                    chunks, tokens, parse_seconds, parsed = measure_responses(translator, subtitles, response_format)
+                    tokens_by_format[response_format] = tokens
+
+                    translate.RESPONSE_FORMAT = response_format
+                    work_file = Path(work_dir) / f"{response_format}_{srt_file.name}"
+                    work_file.write_bytes(srt_file.read_bytes())
+                    result = run_translation([server], work_file)
+
+                    print(f"{srt_file.name[:23]:<24}{response_format:>7}{chunks:>8}{tokens:>9}"
+                          f"{tokens / len(subtitles):>9.1f}{parse_seconds / len(subtitles) * 1e6:>14.1f}"
+                          f"{result['seconds'] / len(subtitles) * 1000:>9.2f}"
+                          f"  {'✅' if result['success'] and parsed == len(subtitles) else '❌'}")
+
+                if tokens_by_format["json"]:
+                    saved = 1 - tokens_by_format["lines"] / tokens_by_format["json"]
+                    print(f"{'':<24}{'lines saves':>24} {saved:.0%} of response tokens")
+            translator.close()
+            os.chdir(original_dir)
+    finally:
+        os.chdir(original_dir)
+        server.stop()
+    print(f"{'='*78}\n")
+
+
+# =========================================================================
+# MAIN ENTRY POINT
+# =========================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the SRT translator")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prompt_parser = subparsers.add_parser("prompt", help="Compare prompt token counts per prompt mode")
+    prompt_parser.add_argument("srt_files", nargs="+", help="Sample SRT files")
+
+    run_parser = subparsers.add_parser("run", help="Translate synthetic files against a local mock API")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000], help="Cues per synthetic file")
+    run_parser.add_argument("--stream", action="store_true", help="Use the bounded-memory streaming pipeline")
+    run_parser.add_argument("--workers", type=int, default=None, help="Override MAX_CONCURRENT_CHUNKS")
+    run_parser.add_argument("--backends", type=int, default=1, help="Number of mock backends in the provider pool")
+    run_parser.add_argument("--hedge", action="store_true", help="Enable hedged requests")
+    run_parser.add_argument("--retry-delay", type=float, default=0.1, help="Override RETRY_DELAY (seconds)")
+    run_parser.add_argument("--latency", type=float, default=0.2, help="Mock seconds before the first token")
+    run_parser.add_argument("--jitter", type=float, default=0.1, help="Mock random extra latency (seconds)")
+    run_parser.add_argument("--tokens-per-second", type=float, default=0, help="Mock generation speed (0 = instant)")
+    run_parser.add_argument("--rpm", type=int, default=0, help="Mock rate limit in requests per minute")
+    run_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    run_parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of truncated responses")
+    run_parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of malformed JSON responses")
+    run_parser.add_argument("--seed", type=int, default=0, help="Seed for injected failures")
+    run_parser.add_argument("--json", dest="results_file", default=None, help="Also save the results to this file")
+
+    parse_parser = subparsers.add_parser("parse", help="Measure SRT parse and write throughput")
+    parse_parser.add_argument("srt_files", nargs="*", help="SRT files (default: synthetic files of each size)")
+    parse_parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 10], help="Synthetic file sizes")
+
+    formats_parser = subparsers.add_parser("formats", help="Compare the JSON and line-oriented response formats")
+    formats_parser.add_argument("srt_files", nargs="*", help="Sample SRT files (default: a synthetic file)")
+    formats_parser.add_argument("--cues", type=int, default=1000, help="Cues in the synthetic file")
+    formats_parser.add_argument("--latency", type=float, default=0.2, help="Mock seconds before the first token")
+    formats_parser.add_argument("--tokens-per-second", type=float, default=200, help="Mock generation speed")
+
+    args = parser.parse_args()
+
+    if args.command == "prompt":
+        benchmark_prompts(args.srt_files)
+    elif args.command == "run":
+        behaviour = MockBehaviour(
+            latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+            requests_per_minute=args.rpm, error_rate=args.error_rate,
+            truncate_rate=args.truncate_rate, malformed_rate=args.malformed_rate, seed=args.seed
+        )
+        benchmark_runs(args.sizes, behaviour, stream=args.stream, workers=args.workers,
+                       retry_delay=args.retry_delay, backends=args.backends, hedge=args.hedge,
+                       results_file=args.results_file)
+    elif args.command == "parse":
+        benchmark_parse(args.megabytes, args.srt_files)
+    elif args.command == "formats":
+        behaviour = MockBehaviour(latency=args.latency, tokens_per_second=args.tokens_per_second)
+        benchmark_formats(args.cues, behaviour, args.srt_files)
+
+
+if __name__ == "__main__":
+    main()
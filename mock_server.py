@@ -0,0 +1,333 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# =========================================================================
+# MOCK OPENAI-COMPATIBLE API
+# =========================================================================
+# A local stand-in for API_ENDPOINT used by benchmark.py. It "translates"
+# every entry of the prompt's JSON block (or "index<TAB>text" lines, answered
+# in the same format) by prefixing it with a marker, answers glossary
+# pre-pass prompts with the capitalized words that recur in them, and
+# can inject the failures a real provider produces: latency, rate limiting,
+# server errors, truncated and malformed responses.
+# =========================================================================
+
+TRANSLATION_PREFIX = "ترجمه: "
+GLOSSARY_REQUEST = "Build a glossary"  # Opening of translate.SRTTranslator.build_glossary_prompt
+
+
+def find_prompt_entries(prompt: str) -> dict:
+    """Find the JSON object of subtitles to translate (the last one in the prompt)"""
+    decoder = json.JSONDecoder()
+    for match in reversed(list(re.finditer(r'^\{', prompt, re.MULTILINE))):
+        try:
+            data, _ = decoder.raw_decode(prompt, match.start())
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return {}
+
+
+def find_prompt_lines(prompt: str) -> dict:
+    """Find the "index<TAB>text" subtitle lines of a line-format prompt (text stays escaped)"""
+    return {match.group(1): match.group(2) for match in re.finditer(r'^(\d+)\t(.*)$', prompt, re.MULTILINE)}
+
+
+def format_lines(entries: dict) -> str:
+    """Answer in the line-oriented format, ending with the END line"""
+    return "\n".join(f"{index}\t{entry['text']}" for index, entry in entries.items()) + "\nEND"
+
+
+def translate_entries(entries: dict) -> dict:
+    """Produce a fake translation with the exact structure the translator expects"""
+    translated = {}
+    for index, entry in entries.items():
+        text = entry.get('text', '') if isinstance(entry, dict) else str(entry)
+        translated[index] = {"text": TRANSLATION_PREFIX + text if text else ""}
+    return translated
+
+
+def build_glossary(prompt: str) -> dict:
+    """A fake glossary: capitalized words seen at least twice in the sampled subtitles"""
+    sample = prompt.split("\nSubtitles:\n", 1)[-1]
+    counts = {}
+    for word in re.findall(r'\b[A-Z][a-z]{2,}\b', sample):
+        counts[word] = counts.get(word, 0) + 1
+    recurring = sorted((word for word, count in counts.items() if count > 1), key=lambda word: -counts[word])
+    return {
+        "synopsis": "A mock story.",
+        "terms": {word: TRANSLATION_PREFIX + word for word in recurring[:20]}
+    }
+
+
+def answer_prompt(prompt: str) -> str:
+    """A correct response to a translation prompt, in the format the prompt uses"""
+    if prompt.startswith(GLOSSARY_REQUEST):
+        return json.dumps(build_glossary(prompt), ensure_ascii=False)
+    entries = find_prompt_entries(prompt)
+    if entries:
+        return json.dumps(translate_entries(entries), ensure_ascii=False, indent=1)
+    return format_lines(translate_entries(find_prompt_lines(prompt)))
+
+
+class MockBehaviour:
+    """Failure injection and timing settings for the mock server"""
+
+    def __init__(self, latency=0.2, jitter=0.0, tokens_per_second=0,
+                 requests_per_minute=0, error_rate=0.0, truncate_rate=0.0,
+                 malformed_rate=0.0, seed=None):
+        self.latency = latency  # Seconds before the first token
+        self.jitter = jitter  # Up to this many extra seconds, at random
+        self.tokens_per_second = tokens_per_second  # Generation speed (0 = instant)
+        self.requests_per_minute = requests_per_minute  # Answer 429 beyond this (0 = unlimited)
+        self.error_rate = error_rate  # Fraction of requests answered with 503
+        self.truncate_rate = truncate_rate  # Fraction of responses cut off mid-JSON
+        self.malformed_rate = malformed_rate  # Fraction of responses with broken JSON syntax
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+
+class MockStats:
+    """Counts of what the mock server answered"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.statuses = {}
+        self.injected = {"truncated": 0, "malformed": 0}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, status: int, injected: str = None, prompt_tokens=0, completion_tokens=0):
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if injected:
+                self.injected[injected] += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "statuses": dict(self.statuses),
+                "injected": dict(self.injected),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like a real provider
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.rstrip('/') != "/v1/chat/completions":
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        try:
+            payload = json.loads(body)
+            prompt = payload['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError):
+            self.send_json(400, {"error": {"message": "Invalid request body"}})
+            return
+
+        behaviour = server.behaviour
+        retry_after = server.admit()
+        if retry_after:
+            server.stats.record(429)
+            self.send_json(429, {"error": {"message": "Rate limit exceeded"}},
+                           headers={"Retry-After": str(retry_after)})
+            return
+        if behaviour.roll(behaviour.error_rate):
+            server.stats.record(503)
+            self.send_json(503, {"error": {"message": "Service unavailable"}})
+            return
+
+        content = answer_prompt(prompt)
+        line_format = content.endswith("\nEND")
+        injected = None
+        finish_reason = "stop"
+        if behaviour.roll(behaviour.truncate_rate):
+            injected = "truncated"
+            finish_reason = "length"
+            content = content[:max(1, int(len(content) * behaviour.random.uniform(0.3, 0.9)))]
+        elif behaviour.roll(behaviour.malformed_rate):
+            injected = "malformed"
+            if line_format:
+                content = "```\n" + content.replace('\t', ': ', 1) + "\n```"
+            else:
+                content = "```json\n" + content.replace('},\n', '}\n', 1) + "\n```"
+
+        usage = {
+            "prompt_tokens": len(prompt) // 4 + 1,
+            "completion_tokens": len(content) // 4 + 1
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        server.stats.record(200, injected, usage["prompt_tokens"], usage["completion_tokens"])
+
+        time.sleep(behaviour.delay())
+        if payload.get("stream"):
+            self.send_stream(payload, content, finish_reason, usage)
+        else:
+            if behaviour.tokens_per_second:
+                time.sleep(usage["completion_tokens"] / behaviour.tokens_per_second)
+            self.send_json(200, {
+                "id": "mock-completion",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": finish_reason
+                }],
+                "usage": usage
+            })
+
+    def send_json(self, status: int, data: dict, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, payload: dict, content: str, finish_reason: str, usage: dict):
+        """Send the response as server-sent events, a few characters per event"""
+        piece_size = 16
+        piece_delay = 0
+        if self.server.behaviour.tokens_per_second:
+            piece_delay = (piece_size / 4) / self.server.behaviour.tokens_per_second
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(data):
+            self.wfile.write(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            for start in range(0, len(content), piece_size):
+                event({"choices": [{"index": 0, "delta": {"content": content[start:start + piece_size]}}]})
+                if piece_delay:
+                    time.sleep(piece_delay)
+            event({"choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]})
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                event({"choices": [], "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading early (all entries received, or a runaway stream)
+
+
+class MockAPIServer(ThreadingHTTPServer):
+    """Threaded mock of an OpenAI-compatible /v1/chat/completions endpoint"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, behaviour: MockBehaviour = None):
+        super().__init__((host, port), MockRequestHandler)
+        self.behaviour = behaviour or MockBehaviour()
+        self.stats = MockStats()
+        self.recent_requests = deque()
+        self.rate_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def admit(self) -> int:
+        """
+        Sliding one-minute window for the simulated rate limit
+
+        Returns 0 when the request is allowed, otherwise the whole seconds
+        until it would be (sent back as Retry-After).
+        """
+        limit = self.behaviour.requests_per_minute
+        if not limit:
+            return 0
+        now = time.monotonic()
+        with self.rate_lock:
+            while self.recent_requests and now - self.recent_requests[0] >= 60:
+                self.recent_requests.popleft()
+            if len(self.recent_requests) >= limit:
+                return max(1, int(60 - (now - self.recent_requests[0])) + 1)
+            self.recent_requests.append(now)
+            return 0
+
+    def start(self):
+        """Serve in a background thread"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# =========================================================================
+# MAIN ENTRY POINT
+# =========================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of an OpenAI-compatible chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency (seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="Generation speed (0 = instant)")
+    parser.add_argument("--rpm", type=int, default=0, help="Answer 429 beyond this many requests per minute")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of truncated responses")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fraction of malformed JSON responses")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(
+        latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+        requests_per_minute=args.rpm, error_rate=args.error_rate,
+        truncate_rate=args.truncate_rate, malformed_rate=args.malformed_rate, seed=args.seed
+    )
+    server = MockAPIServer(args.host, args.port, behaviour)
+    print(f"🧪 Mock API listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 {server.stats.snapshot()}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+import re
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+from typing import List, Dict
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import translate
+from translate import SRTTranslator, TranslationJob
+
+# =========================================================================
+# LOCAL TRANSLATION SERVICE
+# =========================================================================
+# A long-running HTTP front end for SRTTranslator. Uploaded SRT files are
+# stored on disk and queued in SQLite; a pool of worker threads translates
+# them with one shared translator, so connections, the translation memory,
+# the learned chunk size and cached glossaries are reused by every job.
+# Jobs that were running when the service stopped are queued again on the
+# next start and resume from their checkpoints.
+#
+#   POST /jobs?name=movie.srt&language=Persian   (body: the SRT file)
+#   GET  /jobs[?status=queued&limit=100]
+#   GET  /jobs/<id>                              (status and per-chunk progress)
+#   GET  /jobs/<id>/result                       (the translated SRT)
+#   GET  /health
+# =========================================================================
+
+MAX_JOB_ATTEMPTS = 3  # A job that was interrupted this many times is marked failed
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class JobQueue:
+    """Durable SQLite queue of translation jobs and their progress"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, language TEXT NOT NULL, status TEXT NOT NULL, "
+            "input_path TEXT NOT NULL, output_path TEXT NOT NULL, "
+            "created REAL NOT NULL, started REAL, finished REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "chunks_done INTEGER NOT NULL DEFAULT 0, chunks_total INTEGER, "
+            "subtitles_done INTEGER NOT NULL DEFAULT 0, subtitles_total INTEGER, error TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+        self.conn.commit()
+
+    def submit(self, job_id: str, name: str, language: str, input_path: str, output_path: str) -> Dict:
+        """Queue a new job"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, name, language, status, input_path, output_path, created) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, name, language, input_path, output_path, time.time())
+            )
+            self.conn.commit()
+        return self.get(job_id)
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it (None if the queue is empty)"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1, "
+                "chunks_done = 0, chunks_total = NULL, subtitles_done = 0 WHERE id = ?",
+                (time.time(), row['id'])
+            )
+            self.conn.commit()
+        return self.get(row['id'])
+
+    def update_progress(self, job_id: str, chunks_done: int, chunks_total, subtitles_done: int, subtitles_total: int):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET chunks_done = ?, chunks_total = ?, subtitles_done = ?, subtitles_total = ? "
+                "WHERE id = ?",
+                (chunks_done, chunks_total, subtitles_done, subtitles_total, job_id)
+            )
+            self.conn.commit()
+
+    def finish(self, job_id: str, success: bool, error: str = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ?",
+                ("done" if success else "failed", time.time(), error, job_id)
+            )
+            self.conn.commit()
+
+    def requeue_interrupted(self) -> int:
+        """
+        Queue again the jobs that were running when the service stopped
+
+        Jobs interrupted MAX_JOB_ATTEMPTS times are failed instead, so a file
+        that brings the service down cannot do so forever.
+        """
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = 'Interrupted too many times' "
+                "WHERE status = 'running' AND attempts >= ?",
+                (time.time(), MAX_JOB_ATTEMPTS)
+            )
+            requeued = self.conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+            self.conn.commit()
+        return requeued
+
+    def get(self, job_id: str):
+        """One job as a dict, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, status: str = None, limit: int = 100) -> List[Dict]:
+        """Most recent jobs first, optionally only those with the given status"""
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params).fetchall()]
+
+    def counts(self) -> Dict:
+        """Number of jobs per status"""
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class TranslationService:
+    """Worker pool that translates queued jobs with one long-lived, shared SRTTranslator"""
+
+    def __init__(self, data_dir: Path, workers: int = 2):
+        self.data_dir = data_dir
+        self.jobs_dir = data_dir / "jobs"
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, workers)
+        self.queue = JobQueue(data_dir / "jobs.db")
+
+        # Every worker runs its own chunks in parallel through the shared connection pool
+        self.translator = SRTTranslator(
+            http_pool_size=max(translate.HTTP_POOL_SIZE, self.workers * translate.MAX_CONCURRENT_CHUNKS)
+        )
+
+        self.wakeup = threading.Condition()
+        self.stopping = False
+        self.threads = []
+        self.running = {}  # Job ID -> TranslationJob being translated
+
+    def start(self):
+        """Re-queue interrupted jobs and start the workers"""
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"♻️ Re-queued {requeued} interrupted job(s); finished chunks resume from checkpoints")
+        for number in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"service-worker{number + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        """
+        Stop taking jobs, wait for the workers and release the translator
+
+        Running jobs stop handing out chunks and wait only for the requests
+        in flight. They are left marked as running, so the next start queues
+        them again.
+        """
+        with self.wakeup:
+            self.stopping = True
+            for job in list(self.running.values()):
+                job.failed = True  # The scheduler skips the rest of a failed job
+            self.wakeup.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.translator.close()
+        self.queue.close()
+
+    def submit(self, name: str, language: str, data: bytes) -> Dict:
+        """Store an uploaded SRT file and queue it"""
+        job_id = uuid.uuid4().hex
+        job_dir = self.jobs_dir / job_id
+        job_dir.mkdir()
+        input_path = job_dir / name
+        input_path.write_bytes(data)
+        output_path = job_dir / f"{input_path.stem}_{language.lower()}.srt"
+
+        job = self.queue.submit(job_id, name, language, str(input_path), str(output_path))
+        with self.wakeup:
+            self.wakeup.notify()
+        return job
+
+    def work(self):
+        """Worker loop: translate queued jobs one at a time until the service stops"""
+        while not self.stopping:
+            with self.wakeup:
+                row = None if self.stopping else self.queue.claim()
+                if row is None:
+                    self.wakeup.wait(timeout=5)
+                    continue
+
+            try:
+                success, error = self.run_job(row)
+            except Exception as e:
+                success, error = False, f"{type(e).__name__}: {e}"
+            if success is None:
+                return  # Interrupted by the shutdown: queued again on the next start
+            self.queue.finish(row['id'], success, error)
+            # Straight to the console, which --quiet keeps for job results only
+            print(f"{'✅' if success else '❌'} Job {row['id']} ({row['name']} → {row['language']}) "
+                  f"{'done' if success else 'failed'}", file=sys.__stdout__, flush=True)
+
+    def run_job(self, row: Dict):
+        """
+        Translate one job, recording progress after every chunk
+
+        Returns:
+            tuple: (success, error message or None); success is None when the
+                   shutdown interrupted the job, which stays marked as running
+        """
+        translator = self.translator
+        log_dir = translator.session_dir / row['id']
+        # Jobs may share a file name, so each keeps its timing JSON, checkpoint and translation log in its own folder
+        job_dir = Path(row['output_path']).parent
+        jobs = translator.prepare_jobs(row['input_path'], {row['language']: row['output_path']}, log_dir,
+                                       temp_dir=job_dir)
+        if not jobs:
+            return False, "The file could not be parsed as SRT"
+
+        def record_progress(job: TranslationJob):
+            self.queue.update_progress(
+                row['id'],
+                chunks_done=len(job.results),
+                chunks_total=len(job.chunks) if job.planned else None,  # Chunks are cut lazily
+                subtitles_done=len(job.completed) + sum(len(chunk) for chunk in job.results.values()),
+                subtitles_total=len(job.completed) + job.pending_count
+            )
+
+        job = jobs[0]
+        job.on_progress = record_progress
+        job.translation_log = job_dir / f"{row['id']}_translation_log.json"
+        record_progress(job)
+        with self.wakeup:
+            if self.stopping:
+                return None, "The service is stopping"
+            self.running[row['id']] = job
+        try:
+            translator.run_jobs(jobs)
+        finally:
+            with self.wakeup:
+                self.running.pop(row['id'], None)
+                # Decided under the lock stop() takes: a job that finished before the shutdown is not run again
+                interrupted = self.stopping and not job.success
+        if interrupted:
+            return None, "The service is stopping"
+        if not job.success:
+            return False, f"Translation failed (debug logs: {log_dir})"
+        return True, None
+
+    def describe(self, row: Dict) -> Dict:
+        """A job as returned by the API"""
+        def timestamp(value):
+            return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+
+        description = {
+            "id": row['id'],
+            "name": row['name'],
+            "language": row['language'],
+            "status": row['status'],
+            "created": timestamp(row['created']),
+            "started": timestamp(row['started']),
+            "finished": timestamp(row['finished']),
+            "attempts": row['attempts'],
+            "progress": {
+                "chunks_done": row['chunks_done'],
+                "chunks_total": row['chunks_total'],
+                "subtitles_done": row['subtitles_done'],
+                "subtitles_total": row['subtitles_total']
+            }
+        }
+        if row['status'] == "done":
+            description["result"] = f"/jobs/{row['id']}/result"
+        if row['error']:
+            description["error"] = row['error']
+        return description
+
+
+# =========================================================================
+# HTTP API
+# =========================================================================
+
+JOB_PATH = re.compile(r'/jobs/([0-9a-f]{32})(/result)?')
+
+
+def clean_file_name(name: str) -> str:
+    """A safe file name for an upload, always ending in .srt"""
+    name = re.sub(r'[^\w.-]+', '_', Path(name or "").name).strip('._')[:100] or "upload"
+    return name if name.lower().endswith(".srt") else f"{name}.srt"
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def service(self) -> TranslationService:
+        return self.server.service
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != "/jobs":
+            self.send_json(404, {"error": f"Unknown path {url.path}"})
+            return
+
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.send_json(411, {"error": "Content-Length is required"})
+            return
+        if not translate.is_number(length.strip()):
+            self.send_json(400, {"error": f"Invalid Content-Length: {length!r}"})
+            self.close_connection = True  # The body is not read
+            return
+        length = int(length)
+        if length > self.server.max_upload_bytes:
+            self.send_json(413, {"error": f"Uploads are limited to {self.server.max_upload_bytes} bytes"})
+            self.close_connection = True  # The body is not read
+            return
+        data = self.rfile.read(length)
+        if not data.strip():
+            self.send_json(400, {"error": "The request body must be an SRT file"})
+            return
+
+        query = parse_qs(url.query)
+        name = clean_file_name(query.get('name', [""])[0])
+        language = query.get('language', [translate.TARGET_LANGUAGE])[0].strip()
+        if len(language) > 40 or not re.fullmatch(r'[^\W\d_]+(?:[ -][^\W\d_]+)*', language):
+            self.send_json(400, {"error": f"Invalid language: {language!r}"})
+            return
+
+        job = self.service.submit(name, language, data)
+        self.send_json(202, self.service.describe(job), headers={"Location": f"/jobs/{job['id']}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+
+        if path == "/health":
+            self.send_json(200, {"status": "ok", "workers": self.service.workers, "jobs": self.service.queue.counts()})
+            return
+
+        if path == "/jobs":
+            query = parse_qs(url.query)
+            status = query.get('status', [None])[0]
+            if status and status not in JOB_STATUSES:
+                self.send_json(400, {"error": f"Unknown status {status!r}"})
+                return
+            try:
+                limit = min(1000, max(1, int(query.get('limit', ["100"])[0])))
+            except ValueError:
+                self.send_json(400, {"error": "limit must be a number"})
+                return
+            jobs = self.service.queue.list(status, limit)
+            self.send_json(200, {"jobs": [self.service.describe(job) for job in jobs]})
+            return
+
+        match = JOB_PATH.fullmatch(path)
+        job = self.service.queue.get(match.group(1)) if match else None
+        if job is None:
+            self.send_json(404, {"error": "No such job"})
+            return
+        if not match.group(2):
+            self.send_json(200, self.service.describe(job))
+            return
+
+        if job['status'] != "done":
+            self.send_json(409, {"error": f"Job is {job['status']}", "status": job['status']})
+            return
+        try:
+            body = Path(job['output_path']).read_bytes()
+        except OSError:
+            self.send_json(410, {"error": "The result file is no longer available"})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-subrip; charset=utf-8")
+        self.send_header("Content-Disposition", f'attachment; filename="{Path(job["output_path"]).name}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: Dict, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server in front of a TranslationService"""
+
+    daemon_threads = True
+
+    def __init__(self, service: TranslationService, host="127.0.0.1", port=8080, max_upload_mb: float = 50):
+        super().__init__((host, port), ServiceRequestHandler)
+        self.service = service
+        self.max_upload_bytes = int(max_upload_mb * 1_000_000)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+# =========================================================================
+# MAIN ENTRY POINT
+# =========================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service that queues and translates SRT files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Files translated at the same time (each sends up to MAX_CONCURRENT_CHUNKS chunks)")
+    parser.add_argument("--data-dir", default="service_data", help="Job database, uploads and results")
+    parser.add_argument("--max-upload-mb", type=float, default=50, help="Largest accepted SRT upload")
+    parser.add_argument("--quiet", action="store_true", help="Only print job results, not translation progress")
+    args = parser.parse_args()
+
+    service = TranslationService(Path(args.data_dir), args.workers)
+    server = ServiceHTTPServer(service, args.host, args.port, args.max_upload_mb)
+    service.start()
+    print(f"🛰️ Translation service listening on {server.url} ({service.workers} worker(s), data in {args.data_dir})")
+    print(f"📊 Jobs: {service.queue.counts()}")
+
+    if args.quiet:
+        # Translation progress still goes to the debug logs
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = sys.__stdout__
+        print("🛑 Stopping (running jobs resume on the next start)")
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import translate  # noqa: E402
+from mock_server import MockAPIServer, MockBehaviour  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory with settings that keep tests fast and offline"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(translate, "API_BACKENDS", [])
+    monkeypatch.setattr(translate, "ENABLE_GLOSSARY", False)
+    monkeypatch.setattr(translate, "ENABLE_TRANSLATION_MEMORY", False)
+    monkeypatch.setattr(translate, "ENABLE_METRICS", False)
+    monkeypatch.setattr(translate, "ADAPTIVE_CHUNK_SIZE", False)
+    monkeypatch.setattr(translate, "DEBUG_LOG_LEVEL", "off")
+    monkeypatch.setattr(translate, "RETRY_DELAY", 0.01)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_api(workdir, monkeypatch):
+    """A mock API server the translator talks to; set its `behaviour` attributes to inject failures"""
+    server = MockAPIServer(behaviour=MockBehaviour(latency=0.01, seed=1)).start()
+    monkeypatch.setattr(translate, "API_BACKENDS", [{"name": "mock", "endpoint": server.url, "api_key": "test"}])
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_srt(workdir):
+    """Factory writing an SRT file of `count` two-second cues into the working directory"""
+    def make(name: str, count: int, text: str = "Line number {n} of the test file.") -> Path:
+        blocks = []
+        for n in range(1, count + 1):
+            start = translate.format_srt_time(n * 2000)
+            end = translate.format_srt_time(n * 2000 + 1500)
+            blocks.append(f"{n}\n{start} --> {end}\n{text.format(n=n)}\n")
+        path = workdir / name
+        path.write_text("\n".join(blocks), encoding="utf-8")
+        return path
+    return make
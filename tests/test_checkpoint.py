@@ -0,0 +1,58 @@
+import threading
+import time
+
+import translate
+from translate import CheckpointJournal, SRTTranslator
+
+
+def test_journal_round_trip(tmp_path):
+    journal = CheckpointJournal(tmp_path / "checkpoints" / "file.jsonl")
+    journal.record({"1": {"text": "a"}, "2": {"text": "b"}})
+    journal.record({"3": {"text": "c"}})
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"4": {"te')  # Cut off by a crash mid-write
+
+    assert journal.load() == {"1": {"text": "a"}, "2": {"text": "b"}, "3": {"text": "c"}}
+    offsets = journal.load_offsets()
+    assert sorted(offsets) == ["1", "2", "3"]
+    assert journal.read(["3", "1"], offsets) == {"3": {"text": "c"}, "1": {"text": "a"}}
+
+    journal.remove()
+    assert journal.load() == {}
+
+
+def test_chunks_in_flight_are_checkpointed_after_another_chunk_fails(workdir, make_srt, monkeypatch):
+    monkeypatch.setattr(translate, "MAX_SUBTITLES_PER_CHUNK", 10)
+    monkeypatch.setattr(translate, "MAX_CONCURRENT_CHUNKS", 4)
+    srt_file = make_srt("movie.srt", 40)
+    failed = threading.Event()
+
+    def translate_chunk(self, subtitles, chunk_num=0, total_chunks=1):
+        if chunk_num == 1:
+            return {}
+        failed.wait(5)  # Still in flight when chunk 2 fails
+        time.sleep(0.05)
+        return {sub.index: {"text": f"translated {sub.index}"} for sub in subtitles}
+
+    original_complete = SRTTranslator.complete_chunk
+
+    def complete_chunk(self, job, chunk_num, future):
+        original_complete(self, job, chunk_num, future)
+        if job.failed:
+            failed.set()
+
+    monkeypatch.setattr(SRTTranslator, "translate_chunk", translate_chunk)
+    monkeypatch.setattr(SRTTranslator, "complete_chunk", complete_chunk)
+
+    translator = SRTTranslator()
+    try:
+        jobs = translator.prepare_jobs(str(srt_file), {"Persian": str(workdir / "out.srt")}, workdir / "logs")
+        translator.run_jobs(jobs)
+    finally:
+        translator.close()
+
+    job = jobs[0]
+    assert job.failed and not job.success
+    journal = CheckpointJournal(translator.checkpoint_path(str(srt_file), "Persian")).load()
+    expected = {str(n) for n in range(1, 11)} | {str(n) for n in range(21, 41)}
+    assert set(journal) == expected
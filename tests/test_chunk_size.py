@@ -0,0 +1,52 @@
+import json
+
+from translate import ChunkSizeController
+
+
+def make_controller(tmp_path, models=("model-a",), initial=6000):
+    return ChunkSizeController(tmp_path / "chunk_size.json", list(models), initial=initial,
+                               minimum=500, ceiling=12000, target_seconds=30)
+
+
+def test_issues_halve_the_budget_to_the_failed_chunk(tmp_path):
+    controller = make_controller(tmp_path)
+    assert controller.record("model-a", 6000, 10, {"truncated"}) == 3000
+    # A chunk cut before the shrink fails too: the budget is not halved again
+    assert controller.record("model-a", 5800, 10, {"truncated"}) == 2900
+    assert controller.record("model-a", 200, 10, {"timeout"}) == 500  # Never below the minimum
+
+
+def test_clean_fast_full_chunks_grow_the_budget(tmp_path):
+    controller = make_controller(tmp_path)
+    assert controller.record("model-a", 5900, 10, set()) == 6600
+    assert controller.record("model-a", 1000, 10, set()) == 6600  # Too small to say anything
+    assert controller.record("model-a", 6600, 60, set()) == 6600  # Too slow
+    for _ in range(20):
+        controller.record("model-a", controller.budget, 10, set())
+    assert controller.budget == 12000  # Capped at the ceiling
+
+
+def test_chunks_are_cut_to_the_smallest_model_budget(tmp_path):
+    controller = make_controller(tmp_path, models=("model-a", "model-b"))
+    controller.record("model-b", 6000, 10, {"incomplete"})
+    assert controller.budgets == {"model-a": 6000, "model-b": 3000}
+    assert controller.budget == 3000
+
+
+def test_learned_budgets_are_saved_per_model(tmp_path):
+    (tmp_path / "chunk_size.json").write_text(json.dumps({"other-model": 1234}))
+    controller = make_controller(tmp_path)
+    assert not controller.learned
+    controller.record("model-a", 6000, 10, {"truncated"})
+    controller.save()
+
+    assert json.loads((tmp_path / "chunk_size.json").read_text()) == {"other-model": 1234, "model-a": 3000}
+    restored = make_controller(tmp_path)
+    assert restored.learned and restored.budget == 3000
+
+
+def test_corrupt_or_out_of_range_state_is_ignored(tmp_path):
+    (tmp_path / "chunk_size.json").write_text("not json")
+    assert make_controller(tmp_path).budget == 6000
+    (tmp_path / "chunk_size.json").write_text(json.dumps({"model-a": 10 ** 9}))
+    assert make_controller(tmp_path).budget == 12000
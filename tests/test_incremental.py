@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from translate import Cue, SRTTranslator
+
+
+@pytest.fixture
+def translator(workdir):
+    translator = SRTTranslator()
+    yield translator
+    translator.close()
+
+
+def cues(*texts, first_index=1):
+    return [Cue(str(n), f"00:00:{n:02d},000 --> 00:00:{n:02d},500", text)
+            for n, text in enumerate(texts, first_index)]
+
+
+def test_unchanged_cues_reuse_their_translation_after_renumbering(translator):
+    previous = [("Hello", "سلام"), ("How are you?", "چطوری؟"), ("Bye", "خداحافظ")]
+    # A new cue at the start shifts every index and timing
+    subtitles = cues("Intro", "Hello", "How are  you?", "Bye", first_index=10)
+    assert translator.align_previous_translation(subtitles, previous) == {
+        "11": {"text": "سلام"}, "12": {"text": "چطوری؟"}, "13": {"text": "خداحافظ"}}
+
+
+def test_changed_cues_are_translated_again(translator):
+    previous = [("One", "یک"), ("Two", "دو"), ("Three", "سه")]
+    subtitles = cues("One", "Two, revised", "Three")
+    assert translator.align_previous_translation(subtitles, previous) == {
+        "1": {"text": "یک"}, "3": {"text": "سه"}}
+
+
+def test_moved_and_repeated_cues_fall_back_to_matching_text(translator):
+    previous = [("A", "a1"), ("B", "b1"), ("C", "c1"), ("D", "d1")]
+    subtitles = cues("C", "A", "B", "D", "A")
+    reused = translator.align_previous_translation(subtitles, previous)
+    assert reused == {"1": {"text": "c1"}, "2": {"text": "a1"}, "3": {"text": "b1"},
+                      "4": {"text": "d1"}, "5": {"text": "a1"}}
+
+
+def test_load_previous_translation(translator, workdir, make_srt):
+    log = workdir / "old_log.json"
+    log.write_text(json.dumps({"2": {"text": "دو", "source": "Two"}, "1": {"text": "یک", "source": "One"}}),
+                   encoding="utf-8")
+    assert translator.load_previous_translation(str(log)) == [("One", "یک"), ("Two", "دو")]
+
+    # Older logs have no source text; it comes from the previous source SRT
+    log.write_text(json.dumps({"1": {"text": "یک"}, "2": {"text": "دو"}}), encoding="utf-8")
+    assert translator.load_previous_translation(str(log)) == []
+    previous_srt = make_srt("old.srt", 2)
+    assert translator.load_previous_translation(str(log), str(previous_srt)) == [
+        ("Line number 1 of the test file.", "یک"), ("Line number 2 of the test file.", "دو")]
+
+
+def test_batch_files_with_the_same_name_keep_separate_logs(mock_api, workdir, make_srt):
+    for season in ("S01", "S02"):
+        (workdir / season).mkdir()
+    make_srt("S01/E01.srt", 3, text="Season one, line {n}.")
+    make_srt("S02/E01.srt", 3, text="Season two, line {n}.")
+    translator = SRTTranslator()
+    try:
+        assert translator.translate_batch(str(workdir), str(workdir / "out")) == {
+            str(workdir / "S01" / "E01.srt"): True, str(workdir / "S02" / "E01.srt"): True}
+        logs = {season: json.loads(translator.translation_log_path("E01.srt", name=f"{season}_E01")
+                                   .read_text(encoding="utf-8"))
+                for season in ("S01", "S02")}
+        assert logs["S01"]["1"]["source"] == "Season one, line 1."
+        assert logs["S02"]["1"]["source"] == "Season two, line 1."
+
+        # A revised episode is aligned against its own log: only the changed cue is sent
+        revised = workdir / "S02" / "E01.srt"
+        revised.write_text(revised.read_text(encoding="utf-8").replace("line 2.", "line 2, revised."),
+                           encoding="utf-8")
+        before = mock_api.stats.snapshot()["requests"]
+        assert all(translator.translate_batch(str(workdir), str(workdir / "out"), incremental=True).values())
+        assert mock_api.stats.snapshot()["requests"] - before == 1
+    finally:
+        translator.close()
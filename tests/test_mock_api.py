@@ -0,0 +1,69 @@
+import json
+
+import mock_server
+import translate
+from mock_server import TRANSLATION_PREFIX
+from translate import CheckpointJournal, SRTTranslator
+
+
+def translate_file(srt_file, output):
+    translator = SRTTranslator()
+    try:
+        return translator.translate(str(srt_file), str(output)), translator
+    finally:
+        translator.close()
+
+
+def translated_texts(path):
+    return [block.splitlines()[2] for block in path.read_text(encoding="utf-8").strip().split("\n\n")]
+
+
+def expected_texts(count):
+    return [f"{TRANSLATION_PREFIX}Line number {n} of the test file." for n in range(1, count + 1)]
+
+
+def test_missing_entries_are_salvaged(mock_api, make_srt, workdir, monkeypatch):
+    srt_file = make_srt("movie.srt", 20)
+    answered = []
+
+    def answer_prompt(prompt):
+        # The first answer leaves out two entries, as models sometimes do
+        entries = mock_server.find_prompt_entries(prompt)
+        if not answered:
+            entries = {index: entry for index, entry in entries.items() if index not in ("5", "17")}
+        answered.append(sorted(entries, key=int))
+        return json.dumps(mock_server.translate_entries(entries), ensure_ascii=False)
+
+    monkeypatch.setattr(mock_server, "answer_prompt", answer_prompt)
+    success, _ = translate_file(srt_file, workdir / "out.srt")
+
+    assert success
+    assert answered[1:] == [["5", "17"]]  # One salvage round asks for only the missing entries
+    assert translated_texts(workdir / "out.srt") == expected_texts(20)
+
+
+def test_failed_run_resumes_from_checkpoint(mock_api, make_srt, workdir, monkeypatch):
+    monkeypatch.setattr(translate, "MAX_SUBTITLES_PER_CHUNK", 10)
+    monkeypatch.setattr(translate, "MAX_CONCURRENT_CHUNKS", 1)
+    srt_file = make_srt("movie.srt", 30)
+    output = workdir / "out.srt"
+    answer_prompt = mock_server.answer_prompt
+
+    # The second chunk gets no usable answer, so the run fails before the third is sent
+    def broken_answer(prompt):
+        return "Sorry, I can't help with that." if "Line number 11 " in prompt else answer_prompt(prompt)
+
+    monkeypatch.setattr(mock_server, "answer_prompt", broken_answer)
+    success, translator = translate_file(srt_file, output)
+    assert not success and not output.exists()
+    checkpoint = translator.checkpoint_path(str(srt_file), translator.target_language)
+    assert sorted(CheckpointJournal(checkpoint).load(), key=int) == [str(n) for n in range(1, 11)]
+
+    monkeypatch.setattr(mock_server, "answer_prompt", answer_prompt)
+    before = mock_api.stats.snapshot()["requests"]
+    success, _ = translate_file(srt_file, output)
+
+    assert success
+    assert mock_api.stats.snapshot()["requests"] - before == 2  # Only the chunks not checkpointed
+    assert not checkpoint.exists()
+    assert translated_texts(output) == expected_texts(30)
@@ -0,0 +1,81 @@
+import pytest
+
+import translate
+from translate import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for time.monotonic/time.sleep so waits take no real time"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(translate.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(translate.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60)  # One token per second
+    bucket.consume(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    bucket.refill(clock.now + 30)
+    assert bucket.tokens == pytest.approx(30)
+    bucket.refill(clock.now + 1000)
+    assert bucket.tokens == 60  # Never above capacity
+
+
+def test_token_bucket_oversized_request_waits_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(10)
+    assert bucket.wait_time(500) == pytest.approx(10.0)
+    bucket.refill(clock.now + 10)
+    bucket.consume(500)
+    assert bucket.tokens == pytest.approx(0)
+
+
+def test_token_bucket_settle_refunds_or_leaves_a_debt(clock):
+    bucket = TokenBucket(1000)
+    bucket.consume(400)
+    bucket.settle(400, 100)
+    assert bucket.tokens == pytest.approx(900)
+    bucket.consume(400)
+    bucket.settle(400, 1500)
+    assert bucket.tokens == pytest.approx(-600)
+    assert bucket.wait_time(100) == pytest.approx(700 / (1000 / 60))
+
+
+def test_rate_limiter_paces_requests(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+    start = clock.now
+    waits = [limiter.acquire(0) for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]  # A full bucket allows a burst
+    assert waits[2] == pytest.approx(30.0)
+    assert clock.now - start == pytest.approx(60.0)
+
+
+def test_rate_limiter_token_budget_and_pause(clock):
+    limiter = RateLimiter(tokens_per_minute=6000, headroom=0.5)  # 3000 usable per minute
+    assert limiter.acquire(3000) == 0.0
+    assert limiter.acquire(1500) == pytest.approx(30.0)
+    limiter.pause(5)
+    assert limiter.acquire(0) == pytest.approx(5.0)
+
+
+def test_rate_limiter_disabled_without_quotas(clock):
+    limiter = RateLimiter()
+    assert not limiter.enabled
+    assert limiter.acquire(10 ** 6) == 0.0
+    assert clock.slept == []
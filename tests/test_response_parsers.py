@@ -0,0 +1,98 @@
+import json
+
+from translate import JSONEntryParser, LineEntryParser, escape_line_text, unescape_line_text
+
+
+def feed_in_pieces(parser, text, size=7):
+    """Feed `text` a few characters at a time, collecting the entries each piece completes"""
+    seen = {}
+    for start in range(0, len(text), size):
+        seen.update(parser.feed(text[start:start + size]))
+    return seen
+
+
+def test_json_complete_response():
+    parser = JSONEntryParser()
+    parser.feed('{"1": {"text": "سلام"}, "2": {"text": "دو"}}')
+    assert parser.close() == {"1": {"text": "سلام"}, "2": {"text": "دو"}}
+    assert parser.skipped == 0
+
+
+def test_json_entries_arrive_while_streaming():
+    parser = JSONEntryParser()
+    assert parser.feed('{"1": {"text": "a"}, "2": {"te') == {"1": {"text": "a"}}
+    assert parser.feed('xt": "b"}') == {"2": {"text": "b"}}
+    assert parser.feed('}') == {}
+
+
+def test_json_truncated_response_keeps_complete_entries():
+    parser = JSONEntryParser()
+    text = '{"1": {"text": "one"}, "2": {"text": "two"}, "3": {"text": "thr'
+    assert feed_in_pieces(parser, text) == {"1": {"text": "one"}, "2": {"text": "two"}}
+    assert parser.close() == {"1": {"text": "one"}, "2": {"text": "two"}}
+    assert json.loads(parser.completed_text()) == {"1": {"text": "one"}, "2": {"text": "two"}}
+
+
+def test_json_code_fence_and_escaped_quotes():
+    parser = JSONEntryParser()
+    text = '```json\n{\n  "1": {"text": "He said \\"hi\\"\\nand left"},\n  "2": {"text": "ok"}\n}\n```'
+    feed_in_pieces(parser, text, size=3)
+    assert parser.close() == {"1": {"text": 'He said "hi"\nand left'}, "2": {"text": "ok"}}
+
+
+def test_json_malformed_entry_is_skipped():
+    parser = JSONEntryParser()
+    parser.feed('{"1": {"text": "a"}, "2": {"text": oops}, "3": {"text": "c"}}')
+    assert parser.close() == {"1": {"text": "a"}, "3": {"text": "c"}}
+    assert parser.skipped == 1
+
+
+def test_json_malformed_entry_waits_for_more_input():
+    parser = JSONEntryParser()
+    # The value is incomplete rather than malformed until a later entry completes
+    assert parser.feed('{"1": {"text": "a') == {}
+    assert parser.skipped == 0
+    assert parser.feed('b"}}') == {"1": {"text": "ab"}}
+
+
+def test_lines_complete_response():
+    parser = LineEntryParser()
+    parser.feed("1\tسلام\n2\tدو\nEND")
+    assert parser.close() == {"1": {"text": "سلام"}, "2": {"text": "دو"}}
+    assert parser.skipped == 0
+
+
+def test_lines_count_once_their_newline_arrives():
+    parser = LineEntryParser()
+    assert parser.feed("1\tone\n2\ttw") == {"1": {"text": "one"}}
+    assert parser.feed("o\n") == {"2": {"text": "two"}}
+
+
+def test_lines_truncated_response_drops_the_cut_line():
+    parser = LineEntryParser()
+    feed_in_pieces(parser, "1\tone\n2\ttwo\n3\tthr")
+    assert parser.close() == {"1": {"text": "one"}, "2": {"text": "two"}}
+    assert parser.skipped == 1
+    assert parser.completed_text() == "1\tone\n2\ttwo\nEND"
+
+
+def test_lines_escapes_code_fences_and_loose_entries():
+    parser = LineEntryParser()
+    text = "```\n1\tHe said \"hi\"\\nand left\n2: a\\\\b\\tc\n3 | plain\n```\nEND\n4\tafter the end\n"
+    feed_in_pieces(parser, text, size=3)
+    assert parser.close() == {"1": {"text": 'He said "hi"\nand left'},
+                              "2": {"text": "a\\b\tc"},
+                              "3": {"text": "plain"}}
+
+
+def test_lines_continuation_lines_join_the_previous_entry():
+    parser = LineEntryParser()
+    parser.feed("Here you go:\n1\tfirst line\nsecond line\n2\tnext\nEND\n")
+    assert parser.close() == {"1": {"text": "first line\nsecond line"}, "2": {"text": "next"}}
+    assert parser.skipped == 1  # The preamble before the first entry
+
+
+def test_line_escaping_round_trip():
+    text = "back\\slash\ttab\nnew line"
+    assert "\n" not in escape_line_text(text)
+    assert unescape_line_text(escape_line_text(text)) == text
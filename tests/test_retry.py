@@ -0,0 +1,40 @@
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from translate import backoff_delay, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-3") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # In the past
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "Mon, 99 Foo 2020"])
+def test_parse_retry_after_invalid(value):
+    assert parse_retry_after(value) is None
+
+
+def test_backoff_delay_grows_with_jitter_up_to_the_cap():
+    random.seed(0)
+    for attempt, full in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 10.0)]:
+        delays = [backoff_delay(attempt, 1.0, 10.0) for _ in range(200)]
+        assert all(full / 2 <= delay <= full for delay in delays)
+        assert max(delays) - min(delays) > full / 4  # Jittered, not fixed
+
+
+def test_backoff_delay_respects_retry_after():
+    random.seed(0)
+    for _ in range(100):
+        assert 30.0 <= backoff_delay(1, 1.0, 10.0, retry_after=30.0) <= 31.0
+    # A short Retry-After does not cut the backoff
+    assert all(backoff_delay(4, 1.0, 10.0, retry_after=0.5) >= 4.0 for _ in range(100))
@@ -0,0 +1,45 @@
+import time
+
+import service
+from mock_server import TRANSLATION_PREFIX
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} is still {queue.get(job_id)['status']}")
+
+
+def test_jobs_with_the_same_file_name_keep_their_files_apart(mock_api, workdir):
+    svc = service.TranslationService(workdir / "service_data", workers=2).start()
+    try:
+        first = svc.submit("movie.srt", "Persian", b"1\n00:00:01,000 --> 00:00:02,000\nFirst movie\n")
+        second = svc.submit("movie.srt", "Persian", b"1\n00:00:01,000 --> 00:00:02,000\nSecond movie\n")
+        for job, text in ((first, "First movie"), (second, "Second movie")):
+            assert wait_for(svc.queue, job['id'])['status'] == "done"
+            job_dir = workdir / "service_data" / "jobs" / job['id']
+            assert text in (job_dir / "movie_with_timing.json").read_text(encoding="utf-8")
+            assert f"{TRANSLATION_PREFIX}{text}" in (job_dir / "movie_persian.srt").read_text(encoding="utf-8")
+    finally:
+        svc.stop()
+    assert not (workdir / "temp_json" / "movie_with_timing.json").exists()
+
+
+def test_job_finished_as_the_service_stops_is_not_run_again(mock_api, workdir, monkeypatch):
+    svc = service.TranslationService(workdir / "service_data", workers=1)
+    run_jobs = svc.translator.run_jobs
+
+    def run_jobs_then_stop(jobs):
+        run_jobs(jobs)
+        svc.stopping = True  # stop() arrives right after the output was saved
+
+    monkeypatch.setattr(svc.translator, "run_jobs", run_jobs_then_stop)
+    job = svc.submit("movie.srt", "Persian", b"1\n00:00:01,000 --> 00:00:02,000\nHello\n")
+    svc.start()
+    svc.threads[0].join(10)
+    assert svc.queue.get(job['id'])['status'] == "done"
+    svc.stop()
@@ -0,0 +1,107 @@
+import translate
+from translate import Cue, decode_srt, iter_srt_cues, iter_text_blocks, parse_srt_text, parse_timing_line
+
+
+def parse(content):
+    stats = {}
+    cues = list(iter_srt_cues(iter_text_blocks(content.strip()), stats))
+    return [(cue.index, cue.time, cue.text) for cue in cues], stats
+
+
+def test_parse_timing_line():
+    assert parse_timing_line("00:01:02,345 --> 01:00:00,000") == (62345, 3600000)
+    assert parse_timing_line("  00:00:01.5 --> 00:00:02,25  X1:100 X2:200") == (1500, 2250)
+    assert parse_timing_line("100:00:00,000 --> 100:00:01,000") == (360000000, 360001000)
+    assert parse_timing_line("Hello --> there") is None
+    assert parse_timing_line("00:00:0٣,000 --> 00:00:04,000") is None
+
+
+def test_regular_cues():
+    cues, stats = parse("1\n00:00:01,000 --> 00:00:02,000\nHello\nthere\n\n"
+                        "2\n00:00:03,000 --> 00:00:04,000\nBye\n")
+    assert cues == [("1", "00:00:01,000 --> 00:00:02,000", "Hello\nthere"),
+                    ("2", "00:00:03,000 --> 00:00:04,000", "Bye")]
+    assert stats == {"renumbered": 0, "skipped_lines": 0}
+
+
+def test_irregular_timing_lines_are_kept_verbatim():
+    cues, _ = parse("1\n00:00:01.000 --> 00:00:02.000 X1:10\nHello\n")
+    assert cues == [("1", "00:00:01.000 --> 00:00:02.000 X1:10", "Hello")]
+
+
+def test_missing_and_out_of_order_indices_are_renumbered():
+    cues, stats = parse("00:00:01,000 --> 00:00:02,000\nNo index\n\n"
+                        "5\n00:00:03,000 --> 00:00:04,000\nFive\n\n"
+                        "3\n00:00:05,000 --> 00:00:06,000\nThree\n\n"
+                        "0\n00:00:07,000 --> 00:00:08,000\nZero\n")
+    assert [(index, text) for index, _, text in cues] == [("1", "No index"), ("5", "Five"),
+                                                          ("6", "Three"), ("7", "Zero")]
+    assert stats["renumbered"] == 3
+
+
+def test_blank_lines_inside_text_and_missing_separators():
+    cues, stats = parse("Stray line\n\n"
+                        "1\n00:00:01,000 --> 00:00:02,000\nFirst\n\nstill first\n\n"
+                        "2\n00:00:03,000 --> 00:00:04,000\n\n"
+                        "3\n00:00:05,000 --> 00:00:06,000\nThird\n"
+                        "4\n00:00:07,000 --> 00:00:08,000\nFourth\n")
+    assert cues == [("1", "00:00:01,000 --> 00:00:02,000", "First\nstill first"),
+                    ("2", "00:00:03,000 --> 00:00:04,000", ""),
+                    ("3", "00:00:05,000 --> 00:00:06,000", "Third"),
+                    ("4", "00:00:07,000 --> 00:00:08,000", "Fourth")]
+    assert stats == {"renumbered": 0, "skipped_lines": 1}
+
+
+def test_text_with_an_arrow_is_not_a_timing_line():
+    cues, _ = parse("1\n00:00:01,000 --> 00:00:02,000\nGo --> there\n")
+    assert cues == [("1", "00:00:01,000 --> 00:00:02,000", "Go --> there")]
+
+
+def test_cue_span_is_parsed_on_demand():
+    cue = Cue("1", "00:00:01,500 --> 00:00:03,000", "Hi")
+    assert (cue.start, cue.end) == (1500, 3000)
+    assert Cue("1", "garbled", "Hi").span == (None, None)
+    assert cue.to_srt("Salut") == "1\n00:00:01,500 --> 00:00:03,000\nSalut\n"
+
+
+def test_parse_srt_text_matches_block_parser():
+    regular = "".join(f"{n}\n00:00:{n:02d},000 --> 00:00:{n:02d},500\nLine {n}\nsecond\n\n" for n in range(1, 30))
+    variants = [
+        regular,
+        regular.replace("\n\n7\n", "\n\n4\n"),             # Out-of-order index
+        regular.replace("Line 5\n", "Line 5\n \n"),         # Whitespace-only line inside a text
+        regular.replace("Line 9", "Line --> 9"),            # Arrow inside a text
+        regular.replace("\n\n12\n", "\n12\n"),              # Missing blank line
+        regular.replace("\n\n3\n", "\n\n\n3\n"),            # Two blank lines
+        regular.replace("Line 2\nsecond", ""),              # Cue without text
+    ]
+    for content in variants:
+        fast_stats, slow_stats = {}, {}
+        fast = [(c.index, c.time, c.text) for c in parse_srt_text(content, fast_stats)]
+        slow = [(c.index, c.time, c.text) for c in iter_srt_cues(iter_text_blocks(content.strip()), slow_stats)]
+        assert fast == slow
+        assert fast_stats == slow_stats
+
+
+def test_decode_srt_encodings(monkeypatch):
+    monkeypatch.setattr(translate, "SRT_FALLBACK_ENCODING", "cp1256")
+    assert decode_srt("\ufeff1\r\n".encode("utf-8")) == ("1\r\n", "utf-8-sig")
+    assert decode_srt("سلام".encode("utf-16")) == ("سلام", "utf-16")
+    assert decode_srt("سلام".encode("utf-8")) == ("سلام", "utf-8")
+    assert decode_srt("سلام".encode("cp1256")) == ("سلام", "cp1256")
+
+
+def test_parse_srt_and_iter_srt_agree(workdir):
+    content = ("1\r\n00:00:01,000 --> 00:00:02,000\r\nسلام\r\n\r\n"
+               "2\r\n00:00:03,000 --> 00:00:04,000\r\nخوب\r\n\r\n\r\n"
+               "3\r\n00:00:05,000 --> 00:00:06,000\r\nتمام\r\n")
+    path = workdir / "fa.srt"
+    path.write_bytes(content.encode("cp1256"))
+    translator = translate.SRTTranslator()
+    try:
+        parsed = [(c.index, c.time, c.text) for c in translator.parse_srt(str(path))]
+        streamed = [(c.index, c.time, c.text) for c in translator.iter_srt(str(path))]
+    finally:
+        translator.close()
+    assert parsed == streamed
+    assert [text for _, _, text in parsed] == ["سلام", "خوب", "تمام"]
@@ -1,11 +1,30 @@
 import re
 import json
 import os
+import codecs
+import argparse
+import sqlite3
+import hashlib
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 import time
+import random
+import threading
+import queue
+import gzip
+import gc
+import atexit
+import difflib
+import operator
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from collections import deque
+from contextlib import contextmanager
 from typing import List, Dict
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 # =========================================================================
 # CONFIGURATION SECTION - ADJUST THESE SETTINGS
@@ -16,47 +35,1558 @@ API_ENDPOINT = "https://api.avalai.ir/v1/chat/completions"  # OR your own provid
 API_KEY = "YOUR_API_KEY"
 MODEL_NAME = "gemini-2.5-flash-preview-09-2025"  # I strongly suggest to use gemini-2.5-flash
 
+# Provider Pool (optional) - spread chunks over several endpoints, keys and models.
+# Leave empty to use only the API settings above. Each backend may set "name",
+# "endpoint", "api_key", "model", "weight", "requests_per_minute" and
+# "tokens_per_minute"; missing fields fall back to the single-provider settings.
+API_BACKENDS = [
+    # {"name": "avalai", "api_key": "KEY_1", "weight": 2, "requests_per_minute": 60},
+    # {"name": "second-account", "api_key": "KEY_2", "weight": 1, "requests_per_minute": 30},
+]
+CIRCUIT_BREAKER_FAILURES = 3  # Consecutive failures that take a backend out of rotation
+CIRCUIT_BREAKER_COOLDOWN = 60  # Seconds before a tripped backend gets one trial request
+HEDGE_REQUESTS = False  # Send a duplicate request when one is slower than usual
+HEDGE_PERCENTILE = 0.95  # "Slower than usual" = above this percentile of recent request latencies
+HEDGE_MIN_SAMPLES = 10  # Latencies observed before hedging starts
+
 # Translation Configuration
 TARGET_LANGUAGE = "Persian"
 SOURCE_LANGUAGE = "English"
 
+# Input Files
+SRT_FALLBACK_ENCODING = "cp1256"  # For SRT files that are not UTF-8 (legacy Windows Persian/Arabic subtitles)
+
 # Processing Configuration - INCREASED FOR BETTER RESULTS
 MAX_OUTPUT_TOKENS = 24576  # to handle larger responses, maybe you need to change it if the subtitle is longer.
 TEMPERATURE = 0.1
 TOP_P = 0.95
 
+# Prompt Configuration
+PROMPT_MODE = "compact"  # "compact" sends every subtitle once; "full" also repeats all text as a CONTEXT block
+RESPONSE_FORMAT = "json"  # "json" = {"index": {"text": ...}}; "lines" = one "index<TAB>text" line per subtitle (fewer output tokens, compact prompts only)
+
 # Retry Configuration [rate limits, etc.]
 MAX_RETRIES = 3
-RETRY_DELAY = 5
+RETRY_DELAY = 5  # Base delay in seconds, doubled (with jitter) after every failed attempt
+MAX_RETRY_DELAY = 60  # Upper bound for one backoff delay (Retry-After from the server is always honoured)
+RETRY_BUDGET_PER_FILE = 12  # Total retries allowed for one file across all of its chunks
+MAX_SALVAGE_ROUNDS = 2  # Follow-up requests for only the entries missing from a response
 
 # Chunking Configuration (for large files)
-MAX_SUBTITLES_PER_CHUNK = 50  # Process in smaller chunks if needed
+MAX_SUBTITLES_PER_CHUNK = 200  # Upper limit per chunk; chunks are mainly sized by the token budgets below
+CHUNK_OUTPUT_TOKEN_BUDGET = 6000  # Estimated response tokens per chunk (also kept under 80% of MAX_OUTPUT_TOKENS)
+CHUNK_INPUT_TOKEN_BUDGET = 12000  # Estimated prompt tokens per chunk
+OUTPUT_TOKEN_RATIO = 2.0  # Translated text costs about this many times the source tokens
+SCENE_GAP_SECONDS = 3.0  # A pause this long between subtitles is treated as a scene change
 ENABLE_CHUNKING = True  # Set to False to disable chunking
 
+# Adaptive Chunk Size - learns per model how large a chunk is answered reliably
+ADAPTIVE_CHUNK_SIZE = True  # Shrink after truncated/incomplete/timed-out responses, grow while clean and fast
+ADAPTIVE_MIN_OUTPUT_TOKENS = 500  # Never shrink the response budget below this
+ADAPTIVE_TARGET_SECONDS = 60  # Clean chunks answered within this many seconds grow the budget
+CHUNK_SIZE_STATE_FILE = "chunk_sizes.json"  # Learned budget per model, stored inside LOG_DIR
+
+# Glossary Pre-pass - one cheap request per file (or series) extracts names, recurring
+# terms and a short synopsis that every chunk prompt receives, so small chunks stay consistent
+ENABLE_GLOSSARY = True
+GLOSSARY_SCOPE = "file"  # "file", or "folder" to share one glossary between the files of a folder (a series) in batch mode
+GLOSSARY_SAMPLE_TOKENS = 8000  # Source text sent to the pre-pass, sampled evenly across the file(s)
+GLOSSARY_MAX_TERMS = 40  # Names and terms kept, which bounds the tokens added to every chunk prompt
+GLOSSARY_DIR = "glossaries"  # Inside LOG_DIR, one cached glossary per sampled text, model and language pair
+
+# Concurrency Configuration
+MAX_CONCURRENT_CHUNKS = 4  # Number of chunks sent to the API at the same time (1 = one by one)
+
+# Connection Configuration
+HTTP_POOL_SIZE = 8  # Keep-alive connections held open to the API (at least MAX_CONCURRENT_CHUNKS)
+CONNECT_TIMEOUT = 10  # Seconds to wait while connecting to the API
+READ_TIMEOUT = 300  # Seconds to wait for the API to answer
+
+# Streaming Configuration
+STREAM_RESPONSES = False  # Receive responses token by token and parse them as they arrive
+STREAM_STALL_TIMEOUT = 60  # Abort a stream when no data (including the first token) arrives for this long
+STREAM_RUNAWAY_FACTOR = 4.0  # Abort a stream that grows beyond this many times the prompt length
+
+# Rate Limit Configuration (your provider's quota, 0 = unlimited)
+REQUESTS_PER_MINUTE = 0  # Requests per minute
+TOKENS_PER_MINUTE = 0  # Tokens per minute (prompt + expected response, settled against reported usage)
+RATE_LIMIT_HEADROOM = 0.9  # Use only this fraction of the quota to stay just under it
+
+# Deduplication (translate repeated lines within a file only once)
+ENABLE_DEDUPLICATION = True
+
+# Translation Memory (reuses translations of identical lines across files and runs)
+ENABLE_TRANSLATION_MEMORY = True
+TRANSLATION_MEMORY_FILE = "translation_memory.db"  # Stored inside LOG_DIR
+TRANSLATION_MEMORY_MAX_ENTRIES = 200000  # Least recently used lines are evicted beyond this
+
+# Checkpoints (resume an interrupted translation without paying for finished chunks again)
+ENABLE_CHECKPOINTS = True  # Journals are kept in TEMP_DIR/checkpoints until the output is saved
+
 # File Paths
 LOG_DIR = "translation_logs"
 TEMP_DIR = "temp_json"
 DEBUG_DIR = "debug_logs"  # Detailed debug logs
 
+# Metrics (per-stage timings, token usage, retries and cache hits)
+ENABLE_METRICS = True
+METRICS_DIR = "metrics"  # Inside LOG_DIR: <session>.jsonl (one event per line) and <session>.prom (Prometheus text format)
+
+# Debug Logging
+DEBUG_LOG_LEVEL = "summary"  # "off", "errors" (failures only), "summary" (+ SUMMARY.txt) or "full" (every prompt/response)
+DEBUG_LOG_COMPRESS = False  # gzip debug files (saved as .gz)
+
+# =========================================================================
+# HELPER FUNCTIONS
+# =========================================================================
+
+def normalize_text(text: str) -> str:
+    """Normalize subtitle text for lookups (trimmed lines, single spaces)"""
+    return '\n'.join(' '.join(line.split()) for line in text.strip().splitlines())
+
+
+CHUNK_INFO = re.compile(r'_chunk(\d+)(?:of(\d+))?_(?:salvage(\d+)_)?')
+
+
+def describe_chunk(chunk_info: str) -> str:
+    """Readable label for a chunk_info tag such as "_chunk3of7_salvage1_", e.g. " (chunk 3/7, salvage 1)" """
+    match = CHUNK_INFO.fullmatch(chunk_info)
+    if not match:
+        return f" ({chunk_info.strip('_')})" if chunk_info.strip('_') else ""
+    number, total, salvage = match.groups()
+    label = f"chunk {number}/{total}" if total else f"chunk {number}"
+    return f" ({label}, salvage {salvage})" if salvage else f" ({label})"
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate token count (~4 chars/token for Latin text, ~2 for other scripts)"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return ascii_chars // 4 + (len(text) - ascii_chars) // 2 + 1
+
+
+# =========================================================================
+# SRT PARSING
+# =========================================================================
+
+SRT_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+# Only ASCII digits count as numbers: \d and str.isdigit() also accept "²" or "٣", which int() rejects or misreads
+TIMING_LINE = re.compile(r'\s*(\d+):(\d+):(\d+)[,.](\d+)\s*-->\s*(\d+):(\d+):(\d+)[,.](\d+)', re.ASCII)
+# Timing lines as nearly every file writes them; timing lines are kept verbatim, so only the shape matters
+REGULAR_TIMING = r'\d+:\d\d:\d\d,\d\d\d --> \d+:\d\d:\d\d,\d\d\d'
+REGULAR_TIMING_LINE = re.compile(REGULAR_TIMING, re.ASCII)
+# "index\ntiming\n" after a blank line; splitting on it cuts a whole SRT text into cues in one pass
+CUE_HEADER = re.compile(rf'\n\n([1-9]\d*)\n({REGULAR_TIMING})\n', re.ASCII)
+BLOCK_SEPARATOR = re.compile(r'\n\s*\n')
+
+
+def is_number(text: str) -> bool:
+    """Whether `text` is a non-empty run of ASCII digits"""
+    return text.isascii() and text.isdigit()
+
+
+def format_srt_time(ms: int) -> str:
+    """Format milliseconds as an SRT timestamp (HH:MM:SS,mmm)"""
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+class Cue:
+    """
+    One subtitle: index, timing line and text
+    
+    The timing line is kept verbatim (position tags and dots instead of commas
+    survive a round trip); start and end in milliseconds are only parsed from
+    it when they are first needed.
+    """
+    
+    __slots__ = ('index', 'time', 'text', '_span')
+    
+    def __init__(self, index: str, time: str, text: str):
+        self.index = index
+        self.time = time
+        self.text = text
+        self._span = None
+    
+    @property
+    def span(self) -> tuple:
+        """(start_ms, end_ms), or (None, None) if the timing line cannot be parsed"""
+        if self._span is None:
+            self._span = parse_timing_line(self.time) or (None, None)
+        return self._span
+    
+    @property
+    def start(self):
+        """Start in milliseconds"""
+        return self.span[0]
+    
+    @property
+    def end(self):
+        """End in milliseconds"""
+        return self.span[1]
+    
+    def to_srt(self, text: str = None) -> str:
+        """The cue as an SRT block, with `text` in place of its own text if given"""
+        return f"{self.index}\n{self.time}\n{self.text if text is None else text}\n"
+    
+    def to_dict(self) -> Dict:
+        """The cue as a plain dict, for the debug logs"""
+        return {'index': self.index, 'time': self.time, 'text': self.text}
+
+
+def decode_srt(data: bytes):
+    """
+    Decode the contents of an SRT file
+    
+    A byte order mark decides the encoding; otherwise UTF-8 is tried, then
+    SRT_FALLBACK_ENCODING.
+    
+    Returns:
+        tuple: (text, encoding)
+    """
+    for bom, encoding in SRT_BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding).lstrip('\ufeff'), encoding
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return data.decode(SRT_FALLBACK_ENCODING, errors='replace'), SRT_FALLBACK_ENCODING
+
+
+def detect_srt_encoding(srt_file: str, block_size: int = 1 << 20) -> str:
+    """Encoding decode_srt would choose, checked block by block so the file is never fully loaded"""
+    with open(srt_file, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in SRT_BOMS:
+            if head.startswith(bom):
+                return encoding
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        try:
+            decoder.decode(head)
+            for block in iter(lambda: f.read(block_size), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return SRT_FALLBACK_ENCODING
+    return 'utf-8'
+
+
+def parse_timing_line(line: str):
+    """
+    Parse an SRT timing line
+    
+    Returns:
+        tuple: (start_ms, end_ms), or None if it is not a timing line
+    """
+    match = TIMING_LINE.match(line)
+    if not match:
+        return None
+    h1, m1, s1, ms1, h2, m2, s2, ms2 = match.groups()
+    start = ((int(h1) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(ms1.ljust(3, '0')[:3])
+    end = ((int(h2) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(ms2.ljust(3, '0')[:3])
+    return start, end
+
+
+def iter_text_blocks(content: str):
+    """Blocks of an SRT text (separated by blank lines)"""
+    return BLOCK_SEPARATOR.split(content)
+
+
+def iter_file_blocks(lines):
+    """Blocks of an SRT file read line by line (separated by blank lines)"""
+    block = []
+    for line in lines:
+        if line.strip():
+            block.append(line.rstrip('\r\n'))
+        elif block:
+            yield '\n'.join(block)
+            block = []
+    if block:
+        yield '\n'.join(block)
+
+
+def iter_srt_cues(blocks, stats: Dict = None):
+    """
+    Parse SRT blocks into Cue records in a single pass
+    
+    Regular blocks (index, timing line, text) take a fast path.
+    Otherwise a cue starts at any timing line that begins a block or follows
+    an index line, so cues without an index or without text, text containing
+    blank lines and missing blank lines between cues are all handled. Indices
+    that are missing, not numbers or not increasing become the previous index
+    plus one, keeping every index unique and in order.
+    
+    Args:
+        blocks: Blocks of lines separated by blank lines (see iter_text_blocks)
+        stats: Optional dict that receives 'renumbered' and 'skipped_lines' counts
+    """
+    counts = {'renumbered': 0, 'skipped_lines': 0}
+    last_index = 0
+    current = None  # The cue being read; text after a blank line still belongs to it
+    regular_timing = REGULAR_TIMING_LINE.fullmatch
+    
+    def new_cue(index, timing):
+        nonlocal last_index
+        if index is None or int(index) <= last_index:
+            index = last_index + 1
+            counts['renumbered'] += 1
+        else:
+            index = int(index)
+        last_index = index
+        return Cue(str(index), timing, "")
+    
+    def add_text(lines):
+        if current is None:
+            counts['skipped_lines'] += len(lines)  # Lines before the first cue
+        elif lines:
+            text = '\n'.join(lines)
+            current.text = f"{current.text}\n{text}" if current.text else text
+    
+    for block in blocks:
+        # Fast path: "index\ntiming\ntext"
+        parts = block.split('\n', 2)
+        if (len(parts) > 1 and regular_timing(parts[1]) and is_number(parts[0])
+                and (len(parts) == 2 or '-->' not in parts[2])):
+            index = int(parts[0])
+            if index <= last_index:
+                index = last_index + 1
+                counts['renumbered'] += 1
+            last_index = index
+            if current is not None:
+                yield current
+            current = Cue(str(index), parts[1], parts[2] if len(parts) > 2 else "")
+            continue
+        
+        if not block:
+            continue
+        if '-->' not in block:
+            # Text after a blank line inside a subtitle
+            add_text(block.split('\n'))
+            continue
+        
+        # Irregular block: go line by line
+        text_lines = []
+        for line in block.split('\n'):
+            is_timing = '-->' in line and TIMING_LINE.match(line) is not None
+            has_index = bool(text_lines) and is_number(text_lines[-1].strip())
+            if not is_timing or not (has_index or not text_lines):
+                text_lines.append(line)
+                continue
+            # The line before the timing line is this cue's index, not text of the last one
+            index = text_lines.pop().strip() if has_index else None
+            add_text(text_lines)
+            text_lines = []
+            if current is not None:
+                yield current
+            current = new_cue(index, line.strip())
+        add_text(text_lines)
+    
+    if current is not None:
+        yield current
+    
+    if stats is not None:
+        stats.update(counts)
+
+
+@contextmanager
+def paused_gc():
+    """
+    Suspend the cyclic garbage collector while building many acyclic objects
+    
+    Each collection would walk every cue built so far, without ever freeing one.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def parse_srt_text(content: str, stats: Dict = None) -> List[Cue]:
+    """
+    Parse a whole SRT text (with LF line endings) into Cue records
+    
+    A text made only of regular cues (increasing indices, one blank line
+    between cues, no blank lines inside a subtitle) is cut apart by a single
+    regex split and checked column by column; anything else is parsed by
+    iter_srt_cues, with the same result.
+    """
+    content = content.strip()
+    fields = CUE_HEADER.split(f"\n\n{content}")
+    with paused_gc():
+        if not fields[0]:
+            indices, timings, texts = fields[1::3], fields[2::3], fields[3::3]
+            numbers = list(map(int, indices))
+            # NUL is not whitespace, so the joins cannot form a blank line or "-->" of their own
+            joined = "\n\0\n".join(texts)
+            if (all(map(operator.lt, numbers, numbers[1:])) and '-->' not in joined
+                    and not BLOCK_SEPARATOR.search(f"\n{joined}\n")):
+                if stats is not None:
+                    stats.update(renumbered=0, skipped_lines=0)
+                return list(map(Cue, indices, timings, texts))
+        return list(iter_srt_cues(iter_text_blocks(content), stats))
+
+
+# =========================================================================
+# RATE LIMITER
+# =========================================================================
+
+class TokenBucket:
+    """Token bucket that refills continuously up to a per-minute budget"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+    
+    def refill(self, now: float):
+        """Add the tokens earned since the last refill"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        # A single request larger than the whole budget only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+    
+    def consume(self, amount: float):
+        """Spend tokens for one request"""
+        self.tokens -= min(amount, self.capacity)
+    
+    def settle(self, reserved: float, used: float):
+        """Replace a consumed reservation by the amount actually used (may leave a debt)"""
+        self.tokens = min(self.capacity, self.tokens + min(reserved, self.capacity) - used)
+
+
+class RateLimiter:
+    """Paces API calls to stay under requests/minute and tokens/minute quotas"""
+    
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 headroom: float = 1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = None
+        self.token_bucket = None
+        if requests_per_minute > 0:
+            self.request_bucket = TokenBucket(requests_per_minute * headroom)
+        if tokens_per_minute > 0:
+            self.token_bucket = TokenBucket(tokens_per_minute * headroom)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        """True when at least one quota is configured"""
+        return self.request_bucket is not None or self.token_bucket is not None
+    
+    def pause(self, seconds: float):
+        """Stop all dispatch for `seconds` (e.g. after a 429 with Retry-After)"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+    
+    def settle(self, reserved: int, used: int):
+        """Correct a request's token reservation once the provider reports its usage"""
+        if self.token_bucket:
+            with self.lock:
+                self.token_bucket.settle(reserved, used)
+    
+    def acquire(self, tokens: int) -> float:
+        """Block until one request costing `tokens` may be sent, returning seconds waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max(0.0, self.paused_until - now)
+                if self.request_bucket:
+                    self.request_bucket.refill(now)
+                    wait = max(wait, self.request_bucket.wait_time(1))
+                if self.token_bucket:
+                    self.token_bucket.refill(now)
+                    wait = max(wait, self.token_bucket.wait_time(tokens))
+                
+                if wait <= 0:
+                    if self.request_bucket:
+                        self.request_bucket.consume(1)
+                    if self.token_bucket:
+                        self.token_bucket.consume(tokens)
+                    return waited
+            
+            time.sleep(wait)
+            waited += wait
+
+
+# =========================================================================
+# RETRY POLICY
+# =========================================================================
+
+def is_retryable_status(status_code: int) -> bool:
+    """Rate limits, timeouts and server errors are worth retrying; other 4xx are fatal"""
+    return status_code in (408, 425, 429) or status_code >= 500
+
+
+def is_retryable_exception(error: Exception) -> bool:
+    """Network failures and malformed response bodies are worth retrying"""
+    return isinstance(error, (requests.exceptions.Timeout,
+                              requests.exceptions.ConnectionError,
+                              requests.exceptions.ChunkedEncodingError,
+                              ValueError, KeyError, IndexError))
+
+
+def parse_retry_after(value: str):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, retry_after: float = None) -> float:
+    """Exponential backoff with jitter; a server's Retry-After is a lower bound"""
+    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, 1))
+    return delay
+
+
+class RetryBudget:
+    """Thread-safe cap on the number of retries spent on one file"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.lock = threading.Lock()
+    
+    def take(self) -> bool:
+        """Consume one retry, returning False once the budget is exhausted"""
+        with self.lock:
+            if self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+
+# =========================================================================
+# HTTP TRANSPORT
+# =========================================================================
+
+class HTTPTransport:
+    """Persistent keep-alive HTTP session shared by all API calls"""
+    
+    def __init__(self, pool_size: int, connect_timeout: float, read_timeout: float,
+                 stream_timeout: float = None):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.stream_timeout = stream_timeout or read_timeout
+        
+        # Block instead of opening extra connections when the pool is busy
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+    
+    def post(self, url: str, headers: Dict, payload: Dict, stream: bool = False) -> requests.Response:
+        """Send a JSON POST request over a pooled connection"""
+        # Streams use the stall timeout between reads instead of the full read timeout
+        timeout = (self.timeout[0], self.stream_timeout) if stream else self.timeout
+        return self.session.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+def iter_response_lines(response: requests.Response, read_size: int = 16384):
+    """
+    Lines of a streamed response body (bytes, without line endings) as they arrive
+    
+    Each read takes whatever the connection has ready, up to `read_size`
+    bytes: a short first event is not held back waiting for a full block, and
+    a long body is not read byte by byte. Network errors are raised as
+    requests exceptions.
+    """
+    raw = response.raw
+    if isinstance(raw, urllib3.HTTPResponse) and hasattr(raw, 'read1'):
+        chunks = iter(lambda: raw.read1(read_size, decode_content=True), b"")
+    else:
+        chunks = response.iter_content(chunk_size=None)  # urllib3 1.x: one read per transfer chunk
+    pending = b""
+    try:
+        for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line[:-1] if line.endswith(b"\r") else line
+    except urllib3.exceptions.ReadTimeoutError as e:
+        raise requests.exceptions.ReadTimeout(e)
+    except urllib3.exceptions.HTTPError as e:
+        raise requests.exceptions.ChunkedEncodingError(e)
+    if pending:
+        yield pending
+
+
+# =========================================================================
+# PROVIDER POOL
+# =========================================================================
+
+class Backend:
+    """One endpoint/key/model combination with its own rate limit and circuit breaker"""
+    
+    def __init__(self, name: str, endpoint: str, api_key: str, model: str,
+                 weight: float = 1, rate_limiter: RateLimiter = None):
+        self.name = name
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.weight = max(weight, 0.01)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.in_flight = 0
+        self.failures = 0  # Consecutive failures
+        self.open_until = 0.0  # Circuit breaker: out of rotation until then
+        self.trial_in_flight = False  # One trial request while half-open
+        self.latencies = deque(maxlen=200)  # Recent successful request durations
+    
+    def available(self, now: float) -> bool:
+        """Closed breaker, or an expired one whose trial request is not yet taken"""
+        if now >= self.open_until:
+            return self.failures == 0 or not self.trial_in_flight
+        return False
+    
+    def load(self) -> float:
+        """Requests in flight relative to the backend's weight"""
+        return (self.in_flight + 1) / self.weight
+
+
+class ProviderPool:
+    """
+    Routes requests to the least-loaded healthy backend
+    
+    A backend that fails `failure_threshold` times in a row is taken out of
+    rotation for `cooldown` seconds, then gets a single trial request; success
+    closes the breaker again, failure re-opens it.
+    """
+    
+    def __init__(self, backends: List[Backend], failure_threshold: int = 3, cooldown: float = 60):
+        self.backends = backends
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+    
+    def acquire(self, avoid: Backend = None) -> Backend:
+        """
+        Pick the backend for the next request (not `avoid`, if any other is usable)
+        
+        When every breaker is open, the backend that recovers soonest is used
+        rather than failing outright.
+        """
+        with self.lock:
+            now = time.monotonic()
+            healthy = [b for b in self.backends if b.available(now)]
+            preferred = [b for b in healthy
+                         if b is not avoid and b.rate_limiter.paused_until <= now] or \
+                        [b for b in healthy if b is not avoid] or healthy
+            if preferred:
+                backend = min(preferred, key=Backend.load)
+            else:
+                backend = min(self.backends, key=lambda b: b.open_until)
+            if backend.failures >= self.failure_threshold:
+                backend.trial_in_flight = True
+            backend.in_flight += 1
+            return backend
+    
+    def release(self, backend: Backend, success: bool, latency: float = None):
+        """Record the outcome of a request sent with `acquire`"""
+        with self.lock:
+            backend.in_flight -= 1
+            backend.trial_in_flight = False
+            if success:
+                backend.failures = 0
+                backend.open_until = 0.0
+                if latency is not None:
+                    backend.latencies.append(latency)
+                return
+            backend.failures += 1
+            now = time.monotonic()
+            if backend.failures >= self.failure_threshold and backend.open_until <= now:
+                backend.open_until = now + self.cooldown
+                print(f"🔌 Circuit breaker opened for backend '{backend.name}' "
+                      f"({backend.failures} consecutive failures, retry in {self.cooldown:.0f}s)")
+    
+    def trip(self, backend: Backend):
+        """Take a misconfigured backend (e.g. a rejected key) out of rotation right away"""
+        with self.lock:
+            backend.failures = max(backend.failures, self.failure_threshold)
+            backend.open_until = time.monotonic() + self.cooldown
+        print(f"🔌 Backend '{backend.name}' rejected the request - out of rotation for {self.cooldown:.0f}s")
+    
+    def models(self) -> List[str]:
+        """Every model the backends serve, primary first"""
+        return list(dict.fromkeys(backend.model for backend in self.backends))
+    
+    def has_alternative(self, backend: Backend) -> bool:
+        """True when another backend could take the next request right now"""
+        with self.lock:
+            now = time.monotonic()
+            return any(b is not backend and b.available(now) for b in self.backends)
+    
+    def latency_percentile(self, percentile: float, min_samples: int):
+        """Recent successful latency at `percentile` across all backends, or None if too few samples"""
+        with self.lock:
+            samples = sorted(latency for b in self.backends for latency in b.latencies)
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+
+def backends_from_config(configs: List[Dict]) -> List[Backend]:
+    """Build backends from API_BACKENDS entries (or the single API settings if empty)"""
+    backends = []
+    for number, config in enumerate(configs or [{"name": "default"}], 1):
+        backends.append(Backend(
+            name=config.get("name", f"backend{number}"),
+            endpoint=config.get("endpoint", API_ENDPOINT),
+            api_key=config.get("api_key", API_KEY),
+            model=config.get("model", MODEL_NAME),
+            weight=config.get("weight", 1),
+            rate_limiter=RateLimiter(
+                requests_per_minute=config.get("requests_per_minute", REQUESTS_PER_MINUTE),
+                tokens_per_minute=config.get("tokens_per_minute", TOKENS_PER_MINUTE),
+                headroom=RATE_LIMIT_HEADROOM
+            )
+        ))
+    return backends
+
+
+# =========================================================================
+# RESPONSE PARSING
+# =========================================================================
+
+class JSONEntryParser:
+    """
+    Incremental parser for {"index": {"text": ...}, ...} responses
+    
+    Text can be fed in pieces (e.g. while streaming). Every entry whose value
+    is complete is returned as soon as it arrives, so a truncated or lightly
+    malformed response still yields all of its well-formed entries.
+    """
+    
+    ENTRY_START = re.compile(r'"(\d+)"\s*:\s*', re.ASCII)
+    
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.complete_end = 0  # End of the last complete entry (pos also moves past skipped ones)
+        self.entries = {}
+        self.skipped = 0
+        self.decoder = json.JSONDecoder()
+    
+    def feed(self, text: str) -> Dict:
+        """Add more response text, returning the entries completed by it"""
+        self.buffer += text
+        return self._parse(final=False)
+    
+    def close(self) -> Dict:
+        """Finish parsing (skipping anything incomplete) and return all entries"""
+        self._parse(final=True)
+        return self.entries
+    
+    def _parse(self, final: bool) -> Dict:
+        new_entries = {}
+        while True:
+            match = self.ENTRY_START.search(self.buffer, self.pos)
+            if not match or match.end() >= len(self.buffer):
+                break
+            
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, match.end())
+            except json.JSONDecodeError:
+                # Either the value is still arriving or it is malformed; it is
+                # malformed if a later entry is already complete (or input ended)
+                if not final and not self._complete_entry_after(match.end()):
+                    break
+                self.skipped += 1
+                self.pos = match.end()
+                continue
+            
+            self.entries[match.group(1)] = value
+            new_entries[match.group(1)] = value
+            self.pos = self.complete_end = end
+        return new_entries
+    
+    def _complete_entry_after(self, start: int) -> bool:
+        match = self.ENTRY_START.search(self.buffer, start)
+        while match:
+            try:
+                self.decoder.raw_decode(self.buffer, match.end())
+                return True
+            except json.JSONDecodeError:
+                match = self.ENTRY_START.search(self.buffer, match.end())
+        return False
+    
+    def completed_text(self) -> str:
+        """The response up to the last complete entry, closed so it parses normally"""
+        return self.buffer[:self.complete_end].strip() + "\n}"
+
+
+LINE_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\"}
+
+
+def escape_line_text(text: str) -> str:
+    """Escape a subtitle so it fits on one line of the line-oriented format"""
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\r\n", "\n").replace("\n", "\\n")
+
+
+def unescape_line_text(text: str) -> str:
+    """Undo escape_line_text (unknown escapes are kept as they are)"""
+    return re.sub(r'\\(.)', lambda m: LINE_ESCAPES.get(m.group(1), m.group(0)), text)
+
+
+class LineEntryParser:
+    """
+    Incremental parser for line-oriented responses: "index<TAB>text" per line
+    
+    Has the same interface as JSONEntryParser. A line counts once its newline
+    has arrived, so a truncated response loses at most the line it was cut
+    in. The response ends with an END line; without it the last line may be
+    cut short and is dropped. "index: text" lines are accepted as well; any
+    other line continues the entry before it (a line break the model did not
+    escape).
+    """
+    
+    END_MARKER = "END"
+    LOOSE_ENTRY = re.compile(r'\s*(\d+)\s*[:|]\s*(.*)', re.ASCII)  # "index: text" instead of a tab
+    
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.entries = {}
+        self.last_entry = None
+        self.skipped = 0
+        self.ended = False
+    
+    def feed(self, text: str) -> Dict:
+        """Add more response text, returning the entries completed by it"""
+        self.buffer += text
+        return self._parse(final=False)
+    
+    def close(self) -> Dict:
+        """Finish parsing (dropping a possibly cut-off last line) and return all entries"""
+        self._parse(final=True)
+        return self.entries
+    
+    def _parse(self, final: bool) -> Dict:
+        new_entries = {}
+        if self.ended:
+            return new_entries
+        
+        end = self.buffer.rfind("\n", self.pos) + 1 or self.pos
+        if final and self.buffer[end:].strip() == self.END_MARKER:
+            end = len(self.buffer)  # Only an END marker can finish a line without a newline
+        
+        for line in self.buffer[self.pos:end].split("\n") if end > self.pos else ():
+            self.pos += len(line) + 1
+            index, _, text = line.partition("\t")
+            index = index.strip()
+            if not is_number(index):
+                match = self.LOOSE_ENTRY.fullmatch(line)
+                if match:
+                    index, text = match.groups()
+            if is_number(index):
+                text = text.strip()
+                entry = {"text": unescape_line_text(text) if "\\" in text else text}
+                self.entries[index] = entry
+                new_entries[index] = entry
+                self.last_entry = entry
+            elif index == self.END_MARKER:
+                self.ended = True
+                break
+            elif index and not index.startswith("```"):
+                if self.last_entry is not None:
+                    text = line.strip()
+                    self.last_entry["text"] += "\n" + (unescape_line_text(text) if "\\" in text else text)
+                else:
+                    self.skipped += 1
+        self.pos = min(self.pos, end)
+        
+        # A last line without a newline may have been cut off mid-text
+        if final and not self.ended and self.buffer[self.pos:].strip():
+            self.skipped += 1
+        return new_entries
+    
+    def completed_text(self) -> str:
+        """The response up to the last complete entry, with its END line"""
+        if self.ended:
+            return self.buffer[:self.pos].rstrip()
+        return self.buffer[:self.pos].rstrip() + "\n" + self.END_MARKER
+
+
+# =========================================================================
+# TRANSLATION MEMORY
+# =========================================================================
+
+class TranslationMemory:
+    """On-disk SQLite cache of translated lines with LRU eviction"""
+    
+    def __init__(self, db_path: Path, max_entries: int):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            "key TEXT PRIMARY KEY, translation TEXT NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS memory_last_used ON memory (last_used)")
+        self.conn.commit()
+        
+        # Logical clock for LRU ordering (survives restarts)
+        self.clock = self.conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM memory").fetchone()[0]
+    
+    @staticmethod
+    def make_key(text: str, model: str, source_language: str, target_language: str) -> str:
+        """Cache key from normalized source text, model and language pair"""
+        raw = "\x1f".join([model, source_language, target_language, normalize_text(text)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def get_many(self, keys: List[str], count: bool = True) -> Dict[str, str]:
+        """
+        Look up translations for the given keys, refreshing their LRU position
+        
+        With `count` False the lookups are left out of the hit/miss statistics
+        (see record_lookups).
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self.lock:
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, translation FROM memory WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            
+            if found:
+                self.clock += 1
+                self.conn.executemany("UPDATE memory SET last_used = ? WHERE key = ?",
+                                      [(self.clock, key) for key in found])
+                self.conn.commit()
+            
+            if count:
+                self.hits += sum(1 for key in keys if key in found)
+                self.misses += sum(1 for key in keys if key not in found)
+        return found
+    
+    def record_lookups(self, hits: int, misses: int):
+        """Add lookups made with several keys per text to the statistics"""
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+    
+    def put_many(self, items: Dict[str, str]):
+        """Store translations, evicting the least recently used entries when full"""
+        if not items:
+            return
+        with self.lock:
+            self.clock += 1
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO memory (key, translation, last_used) VALUES (?, ?, ?)",
+                [(key, translation, self.clock) for key, translation in items.items()]
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM memory WHERE key IN "
+                    "(SELECT key FROM memory ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self.conn.commit()
+    
+    def stats(self) -> Dict:
+        """Hit/miss statistics for this session"""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries
+            }
+    
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self.conn.close()
+
+
+# =========================================================================
+# CHECKPOINTS
+# =========================================================================
+
+class CheckpointJournal:
+    """Append-only journal of translated chunks, used to resume interrupted runs"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+    
+    def load(self) -> Dict:
+        """Read every translation recorded so far, keyed by subtitle index"""
+        completed = {}
+        if not self.path.exists():
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    completed.update(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves at most one partial line
+                    continue
+        return completed
+    
+    def load_offsets(self) -> Dict:
+        """Map each recorded subtitle index to the offset of its journal line, without the text"""
+        offsets = {}
+        if not self.path.exists():
+            return offsets
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                try:
+                    for index in json.loads(line):
+                        offsets[index] = offset
+                except ValueError:
+                    pass
+                offset += len(line)
+        return offsets
+    
+    def read(self, indices: List[str], offsets: Dict) -> Dict:
+        """Read the recorded translations of `indices` from the lines found by load_offsets()"""
+        found = {}
+        with open(self.path, 'rb') as f:
+            for offset in sorted({offsets[index] for index in indices}):
+                f.seek(offset)
+                found.update(json.loads(f.readline()))
+        return {index: found[index] for index in indices}
+    
+    def record(self, translations: Dict):
+        """Durably append one validated chunk"""
+        line = json.dumps(translations, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def remove(self):
+        """Delete the journal once the output file is saved"""
+        with self.lock:
+            if self.path.exists():
+                self.path.unlink()
+
+
+# =========================================================================
+# CHUNK SIZING
+# =========================================================================
+
+class ChunkSizeController:
+    """
+    Learns the response-token budget per chunk that a model handles reliably
+    
+    A chunk whose response was truncated, incomplete, unparseable or timed out
+    halves the budget (to half that chunk's size, so chunks cut before the
+    shrink do not shrink it again). A chunk near the current budget answered
+    cleanly within `target_seconds` grows it by a tenth of the starting budget,
+    up to `ceiling`. Each model that serves chunks has its own budget, saved
+    for the next run; chunks are cut to the smallest, since any of the models
+    may end up serving them.
+    """
+    
+    def __init__(self, state_path: Path, models: List[str], initial: int, minimum: int,
+                 ceiling: int, target_seconds: float):
+        self.state_path = state_path
+        self.minimum = max(1, min(minimum, ceiling))
+        self.ceiling = ceiling
+        self.step = max(1, initial // 10)
+        self.target_seconds = target_seconds
+        self.lock = threading.Lock()
+        self.dirty = set()
+        
+        state = self.load()
+        self.budgets = {}
+        for model in models:
+            learned = state.get(model)
+            start = learned if isinstance(learned, (int, float)) else initial
+            self.budgets[model] = int(min(max(start, self.minimum), self.ceiling))
+        self.learned = any(model in state for model in models)
+    
+    @property
+    def budget(self) -> int:
+        """Response-token budget to cut the next chunk to"""
+        return min(self.budgets.values())
+    
+    def load(self) -> Dict:
+        """Learned budgets of every model"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def record(self, model: str, chunk_tokens: int, seconds: float, issues) -> int:
+        """Adjust the budget of the model that served a chunk, returning its new budget"""
+        with self.lock:
+            previous = budget = self.budgets.get(model, self.budget)
+            if issues:
+                budget = int(max(self.minimum, min(budget, chunk_tokens * 0.5)))
+            elif seconds <= self.target_seconds and chunk_tokens >= 0.8 * budget:
+                budget = min(self.ceiling, budget + self.step)
+            self.budgets[model] = budget
+            if budget != previous:
+                self.dirty.add(model)
+                direction = "↓" if budget < previous else "↑"
+                reason = f" ({', '.join(sorted(issues))})" if issues else ""
+                via = f" for {model}" if len(self.budgets) > 1 else ""
+                print(f"📐 Chunk budget{via} {direction} {previous} → {budget} response tokens{reason}")
+            return budget
+    
+    def save(self):
+        """Store the learned budgets of the models used (other models' budgets are kept)"""
+        with self.lock:
+            if not self.dirty:
+                return
+            state = self.load()
+            for model in self.dirty:
+                state[model] = self.budgets[model]
+            self.dirty = set()
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.state_path.with_suffix(".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+            os.replace(temp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️ Could not save learned chunk size: {e}")
+
+
+# =========================================================================
+# GLOSSARY
+# =========================================================================
+
+def sample_texts(texts, token_budget: int) -> List[str]:
+    """
+    Evenly spaced texts of about `token_budget` tokens in total
+    
+    Works on an iterable of unknown length with bounded memory: whenever the
+    kept texts exceed the budget, every other one is dropped and the stride
+    between kept texts doubles.
+    """
+    kept = []
+    tokens = 0
+    stride = 1
+    for position, text in enumerate(texts):
+        if position % stride or not text:
+            continue
+        kept.append(text)
+        tokens += estimate_tokens(text)
+        while tokens > token_budget and len(kept) > 1:
+            kept = kept[::2]
+            stride *= 2
+            tokens = sum(estimate_tokens(text) for text in kept)
+    return kept
+
+
+class Glossary:
+    """Names, recurring terms and a short synopsis shared by every chunk prompt of a file or series"""
+    
+    def __init__(self, synopsis: str = "", terms: Dict = None, cached: bool = False):
+        self.synopsis = synopsis
+        self.terms = terms or {}  # {source term: translation}
+        self.cached = cached  # Loaded from disk rather than requested in this run
+    
+    @classmethod
+    def from_dict(cls, data, max_terms: int, cached: bool = False):
+        """Build from the pre-pass response or a cache file; None if nothing usable is in it"""
+        if not isinstance(data, dict):
+            return None
+        synopsis = data.get('synopsis')
+        synopsis = ' '.join(synopsis.split()) if isinstance(synopsis, str) else ""
+        terms = {}
+        if isinstance(data.get('terms'), dict):
+            for source, translation in data['terms'].items():
+                if isinstance(translation, str) and source.strip() and translation.strip():
+                    terms[' '.join(source.split())] = ' '.join(translation.split())
+                if len(terms) >= max_terms:
+                    break
+        if not synopsis and not terms:
+            return None
+        return cls(synopsis, terms, cached)
+    
+    def to_dict(self) -> Dict:
+        return {'synopsis': self.synopsis, 'terms': self.terms}
+    
+    def to_prompt(self, target_language: str) -> str:
+        """The glossary as a prompt section"""
+        lines = []
+        if self.synopsis:
+            lines.append(f"Story: {self.synopsis}")
+        if self.terms:
+            lines.append(f"Glossary - always use these {target_language} renderings:")
+            lines.extend(f"- {source} = {translation}" for source, translation in self.terms.items())
+        return "\n".join(lines)
+
+
+# =========================================================================
+# DEBUG LOGGING
+# =========================================================================
+
+LOG_LEVELS = {"off": 0, "errors": 1, "summary": 2, "full": 3}
+
+
+class DebugLogWriter:
+    """Writes debug files on a background thread so logging never blocks translation"""
+    
+    def __init__(self, compress: bool = False, max_pending: int = 1000):
+        self.compress = compress
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.created_dirs = set()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="debug-log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+    
+    def write(self, filepath: Path, content: str, mode: str = 'w'):
+        """Queue a file write (blocks only if the writer falls far behind; dropped once closed)"""
+        with self.lock:
+            if self.closed:
+                return
+            self.queue.put((filepath, content, mode))
+    
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self.queue.task_done()
+    
+    def _write(self, filepath: Path, content: str, mode: str):
+        try:
+            if filepath.parent not in self.created_dirs:
+                filepath.parent.mkdir(parents=True, exist_ok=True)
+                self.created_dirs.add(filepath.parent)
+            if self.compress:
+                with gzip.open(f"{filepath}.gz", mode + 't', encoding='utf-8', compresslevel=5) as f:
+                    f.write(content)
+            else:
+                with open(filepath, mode, encoding='utf-8') as f:
+                    f.write(content)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not save log file {filepath.name}: {e}")
+    
+    def flush(self):
+        """Wait until every queued file is written"""
+        self.queue.join()
+    
+    def close(self):
+        """Write everything still queued and stop the writer thread"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join()
+
+
+# =========================================================================
+# METRICS
+# =========================================================================
+
+class MetricsRecorder:
+    """
+    Collects timings and counters, exported as JSON lines and Prometheus text
+    
+    Every observation is appended to the JSONL file as it happens (with full
+    labels such as file and chunk); the Prometheus export aggregates them by
+    metric name and its low-cardinality labels (stage, status, type, ...).
+    """
+    
+    PREFIX = "srt_translator"
+    DETAIL_LABELS = ("file", "chunk")  # Kept in JSONL only
+    
+    def __init__(self, jsonl_path: Path, prom_path: Path, context_labels=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.context_labels = context_labels or (lambda: {})
+        self.lock = threading.Lock()
+        self.summaries = {}  # (name, labels) -> [count, sum]
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}
+        self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        self.jsonl_file = open(self.jsonl_path, 'a', encoding='utf-8', buffering=1)
+    
+    def _emit(self, kind: str, name: str, value: float, labels: Dict):
+        labels = {**self.context_labels(), **labels}
+        event = {"ts": round(time.time(), 3), "type": kind, "name": name,
+                 "value": round(value, 6), "labels": labels}
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items()
+                                  if k not in self.DETAIL_LABELS)))
+        with self.lock:
+            if kind == "timing":
+                summary = self.summaries.setdefault(key, [0, 0.0])
+                summary[0] += 1
+                summary[1] += value
+            else:
+                self.counters[key] = self.counters.get(key, 0) + value
+            if not self.jsonl_file.closed:
+                self.jsonl_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+    
+    def observe(self, stage: str, seconds: float, **labels):
+        """Record how long one stage took"""
+        self._emit("timing", stage, seconds, labels)
+    
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Time the enclosed block as one stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, **labels)
+    
+    def incr(self, counter: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        self._emit("counter", counter, amount, labels)
+    
+    def set_gauge(self, gauge: str, value: float):
+        """Set a point-in-time value (exported to Prometheus only)"""
+        with self.lock:
+            self.gauges[gauge] = value
+    
+    def total(self, counter: str) -> float:
+        """Sum of a counter over all of its labels"""
+        with self.lock:
+            return sum(value for (name, _), value in self.counters.items() if name == counter)
+    
+    def export_prometheus(self):
+        """Write all aggregated metrics in the Prometheus text exposition format"""
+        def escape(value):
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        
+        def fmt(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+        
+        lines = []
+        with self.lock:
+            stages = sorted(self.summaries.items())
+            if stages:
+                lines.append(f"# TYPE {self.PREFIX}_stage_seconds summary")
+            for (name, labels), (count, total) in stages:
+                labels = (("stage", name),) + labels
+                lines.append(f"{self.PREFIX}_stage_seconds_count{fmt(labels)} {count}")
+                lines.append(f"{self.PREFIX}_stage_seconds_sum{fmt(labels)} {total:.6f}")
+            
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {self.PREFIX}_{name}_total counter")
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{self.PREFIX}_{name}_total{fmt(labels)} {value:g}")
+            
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {self.PREFIX}_{name} gauge")
+                lines.append(f"{self.PREFIX}_{name} {value:g}")
+            
+            # Under the lock too: jobs finishing at the same time export concurrently
+            with open(self.prom_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+    
+    def close(self):
+        """Export the Prometheus file and close the JSONL stream"""
+        self.export_prometheus()
+        with self.lock:
+            self.jsonl_file.close()
+
+
+class NullMetrics:
+    """Stand-in used when metrics are disabled"""
+    
+    def observe(self, stage: str, seconds: float, **labels):
+        pass
+    
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        yield
+    
+    def incr(self, counter: str, amount: float = 1, **labels):
+        pass
+    
+    def set_gauge(self, gauge: str, value: float):
+        pass
+    
+    def total(self, counter: str) -> float:
+        return 0
+    
+    def export_prometheus(self):
+        pass
+    
+    def close(self):
+        pass
+
+
+# =========================================================================
+# TRANSLATION JOBS
+# =========================================================================
+
+class ChunkPlan:
+    """
+    Chunks of one subtitle list, cut only when the scheduler asks for them
+    
+    Cutting late lets every chunk use the chunk size learned so far. Jobs that
+    translate the same subtitles (e.g. into several languages) share a plan.
+    """
+    
+    def __init__(self, chunks):
+        self.chunk_iter = iter(chunks)
+        self.chunks = []
+        self.exhausted = False
+    
+    def get(self, chunk_num: int):
+        """The chunk at `chunk_num`, cutting it if needed; None past the last chunk"""
+        while len(self.chunks) <= chunk_num and not self.exhausted:
+            try:
+                self.chunks.append(next(self.chunk_iter))
+            except StopIteration:
+                self.exhausted = True
+        return self.chunks[chunk_num] if chunk_num < len(self.chunks) else None
+
+
+class TranslationJob:
+    """Per-file state while the file's chunks are being translated"""
+    
+    def __init__(self, srt_file: str, output_srt: str, log_dir: Path, target_language: str = TARGET_LANGUAGE):
+        self.srt_file = srt_file
+        self.output_srt = output_srt
+        self.log_dir = log_dir
+        self.target_language = target_language
+        self.retry_budget = RetryBudget(RETRY_BUDGET_PER_FILE)
+        self.original_with_timing = {}
+        self.duplicates = {}
+        self.completed = {}
+        self.reused = 0
+        self.checkpoint = None
+        self.plan = None  # ChunkPlan of the subtitles left to translate
+        self.pending_count = 0
+        self.chunks = []  # Chunks handed to workers so far
+        self.planned = False  # Every chunk has been handed out
+        self.results = {}
+        self.remaining = 0  # Chunks handed out but not finished
+        self.failed = False
+        self.success = False
+        self.glossary = None  # Glossary from the pre-pass, if any
+        self.on_progress = None  # Called with the job after each finished chunk
+        self.translation_log = None  # Where to save the translation log (default: translation_log_path)
+        self.models = {}  # Model -> responses it served for this job
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+    
+    def count_response(self, model: str):
+        """Note that `model` answered one of this job's requests"""
+        with self.lock:
+            self.models[model] = self.models.get(model, 0) + 1
+
+
 # =========================================================================
 # SRT TRANSLATOR CLASS
 # =========================================================================
 
 class SRTTranslator:
-    def __init__(self):
-        """Initialize the SRT Translator with configuration from above"""
-        self.api_endpoint = API_ENDPOINT
-        self.api_key = API_KEY
-        self.model_name = MODEL_NAME
-        self.target_language = TARGET_LANGUAGE
+    def __init__(self, http_pool_size: int = HTTP_POOL_SIZE, target_language: str = TARGET_LANGUAGE):
+        """
+        Initialize the SRT Translator with configuration from above
+        
+        Args:
+            http_pool_size: Keep-alive connections to hold open (raised to the
+                            number of concurrent requests if lower)
+            target_language: Language to translate into unless a call names others
+        """
+        # Endpoints, keys and models to send requests to (the first one is the primary)
+        self.providers = ProviderPool(
+            backends_from_config(API_BACKENDS),
+            failure_threshold=CIRCUIT_BREAKER_FAILURES,
+            cooldown=CIRCUIT_BREAKER_COOLDOWN
+        )
+        self.api_endpoint = self.providers.backends[0].endpoint
+        self.api_key = self.providers.backends[0].api_key
+        self.model_name = self.providers.backends[0].model
+        self.target_language = target_language
         self.source_language = SOURCE_LANGUAGE
         self.max_output_tokens = MAX_OUTPUT_TOKENS
         self.temperature = TEMPERATURE
         self.top_p = TOP_P
+        self.prompt_mode = PROMPT_MODE
+        self.response_format = RESPONSE_FORMAT
         self.max_retries = MAX_RETRIES
         self.retry_delay = RETRY_DELAY
+        self.max_retry_delay = MAX_RETRY_DELAY
+        self.retry_budget = RetryBudget(RETRY_BUDGET_PER_FILE)
+        self.max_salvage_rounds = MAX_SALVAGE_ROUNDS
         self.enable_chunking = ENABLE_CHUNKING
         self.max_chunk_size = MAX_SUBTITLES_PER_CHUNK
+        self.max_concurrent_chunks = max(1, MAX_CONCURRENT_CHUNKS)
+        self.enable_deduplication = ENABLE_DEDUPLICATION
+        self.stream_responses = STREAM_RESPONSES
+        self.enable_checkpoints = ENABLE_CHECKPOINTS
+        self.enable_glossary = ENABLE_GLOSSARY
+        
+        # The job a worker thread is currently working on (for logs and retry budgets)
+        self._local = threading.local()
+        
+        # Reused HTTP connections for every API call
+        self.transport = HTTPTransport(
+            pool_size=max(http_pool_size, self.max_concurrent_chunks * (2 if HEDGE_REQUESTS else 1)),
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=READ_TIMEOUT,
+            stream_timeout=STREAM_STALL_TIMEOUT
+        )
+        
+        # Duplicate ("hedged") requests for calls slower than usual, at most one per worker at a time
+        self.hedge_requests = HEDGE_REQUESTS
+        self.hedge_slots = threading.BoundedSemaphore(self.max_concurrent_chunks)
         
         # Create directories
         self.log_dir = Path(LOG_DIR)
@@ -64,44 +1594,166 @@ class SRTTranslator:
         self.debug_dir = Path(DEBUG_DIR)
         self.log_dir.mkdir(exist_ok=True)
         self.temp_dir.mkdir(exist_ok=True)
-        self.debug_dir.mkdir(exist_ok=True)
+        self.glossary_dir = self.log_dir / GLOSSARY_DIR
+        
+        # Translation memory shared by every file and run
+        self.translation_memory = None
+        if ENABLE_TRANSLATION_MEMORY:
+            self.translation_memory = TranslationMemory(
+                self.log_dir / TRANSLATION_MEMORY_FILE,
+                TRANSLATION_MEMORY_MAX_ENTRIES
+            )
+        
+        # Chunk size learned from how the model copes with it
+        self.chunk_sizer = None
+        if ADAPTIVE_CHUNK_SIZE:
+            self.chunk_sizer = ChunkSizeController(
+                self.log_dir / CHUNK_SIZE_STATE_FILE,
+                self.providers.models(),
+                initial=min(CHUNK_OUTPUT_TOKEN_BUDGET, int(self.max_output_tokens * 0.8)),
+                minimum=ADAPTIVE_MIN_OUTPUT_TOKENS,
+                ceiling=int(self.max_output_tokens * 0.8),
+                target_seconds=ADAPTIVE_TARGET_SECONDS
+            )
         
-        # Create session-specific debug directory
+        # Session-specific debug directory (created on the first write)
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.session_dir = self.debug_dir / self.session_id
-        self.session_dir.mkdir(exist_ok=True)
+        self.log_level_name = DEBUG_LOG_LEVEL
+        if self.log_level_name not in LOG_LEVELS:
+            print(f"⚠️ Unknown DEBUG_LOG_LEVEL {DEBUG_LOG_LEVEL!r} (expected one of "
+                  f"{', '.join(LOG_LEVELS)}); using \"summary\"")
+            self.log_level_name = "summary"
+        self.log_level = LOG_LEVELS[self.log_level_name]
+        self.log_writer = DebugLogWriter(compress=DEBUG_LOG_COMPRESS) if self.log_level else None
+        
+        # Structured metrics for this session
+        self.metrics = NullMetrics()
+        if ENABLE_METRICS:
+            metrics_dir = self.log_dir / METRICS_DIR
+            self.metrics = MetricsRecorder(
+                metrics_dir / f"{self.session_id}.jsonl",
+                metrics_dir / f"{self.session_id}.prom",
+                context_labels=self.metric_labels
+            )
         
         print(f"\n{'='*70}")
-        print(f"🎬 SRT SUBTITLE TRANSLATOR v2.0 (WITH FULL LOGGING)")
+        print(f"🎬 SRT SUBTITLE TRANSLATOR v2.0 (LOGGING: {self.log_level_name.upper()})")
         print(f"{'='*70}")
-        print(f"📡 API: {self.api_endpoint}")
-        print(f"🤖 Model: {self.model_name}")
+        if len(self.providers.backends) > 1:
+            print(f"📡 API Backends: {len(self.providers.backends)}")
+            for backend in self.providers.backends:
+                print(f"   • {backend.name}: {backend.endpoint} ({backend.model}, weight {backend.weight:g})")
+        else:
+            print(f"📡 API: {self.api_endpoint}")
+            print(f"🤖 Model: {self.model_name}")
         print(f"🌍 Translation: {self.source_language} → {self.target_language}")
         print(f"🔢 Max Output Tokens: {self.max_output_tokens}")
+        print(f"🗜️ Prompt Mode: {self.prompt_mode} (responses as {'lines' if self.uses_line_format() else 'JSON'})")
+        print(f"📡 Streaming: {'Enabled' if self.stream_responses else 'Disabled'}")
         print(f"📦 Chunking: {'Enabled' if self.enable_chunking else 'Disabled'}")
         if self.enable_chunking:
-            print(f"📏 Chunk Size: {self.max_chunk_size} subtitles")
-        print(f"📁 Debug Session: {self.session_id}")
+            print(f"📏 Chunk Size: ≤{self.max_chunk_size} subtitles, ~{self.chunk_output_budget()} response tokens"
+                  + (f" (adaptive{', learned' if self.chunk_sizer.learned else ''})" if self.chunk_sizer else ""))
+            print(f"⚡ Concurrent Chunks: {self.max_concurrent_chunks}")
+        if any(backend.rate_limiter.enabled for backend in self.providers.backends):
+            for backend in self.providers.backends:
+                limiter = backend.rate_limiter
+                print(f"🚦 Rate Limit ({backend.name}): {limiter.requests_per_minute or '∞'} req/min, "
+                      f"{limiter.tokens_per_minute or '∞'} tokens/min")
+        if self.hedge_requests:
+            print(f"🪞 Hedged Requests: above p{HEDGE_PERCENTILE * 100:g} latency")
+        if self.enable_glossary:
+            print(f"📚 Glossary Pre-pass: per {GLOSSARY_SCOPE}, cached in {self.glossary_dir}")
+        if self.translation_memory:
+            print(f"🧠 Translation Memory: {self.translation_memory.db_path}")
+        if ENABLE_METRICS:
+            print(f"📊 Metrics: {self.metrics.jsonl_path}")
+        print(f"📁 Debug Session: {self.session_id} (logging: {self.log_level_name})")
         print(f"{'='*70}\n")
     
-    def log_to_file(self, filename: str, content: str, mode: str = 'w'):
-        """Save content to a log file in the session directory"""
-        filepath = self.session_dir / filename
+    def close(self):
+        """Release pooled API connections and the translation memory, flush logs and metrics"""
+        if self.chunk_sizer:
+            self.chunk_sizer.save()
+        self.export_metrics()
+        self.metrics.close()
+        self.transport.close()
+        if self.log_writer:
+            self.log_writer.close()
+        if self.translation_memory:
+            self.translation_memory.close()
+    
+    @contextmanager
+    def job_context(self, job: TranslationJob):
+        """Route this thread's logs and retries to the given job"""
+        previous = getattr(self._local, 'job', None)
+        self._local.job = job
         try:
-            with open(filepath, mode, encoding='utf-8') as f:
-                f.write(content)
-            return True
-        except Exception as e:
-            print(f"⚠️ Warning: Could not save log file {filename}: {e}")
+            yield job
+        finally:
+            self._local.job = previous
+    
+    def current_job(self):
+        """The job this thread is working on, or None"""
+        return getattr(self._local, 'job', None)
+    
+    def current_language(self) -> str:
+        """Target language of the job this thread is working on"""
+        job = self.current_job()
+        return job.target_language if job else self.target_language
+    
+    def note_chunk_issue(self, issue: str):
+        """Report a sign that the chunk this thread is translating was too large"""
+        issues = getattr(self._local, 'chunk_issues', None)
+        if issues is not None:
+            issues.add(issue)
+    
+    def metric_labels(self) -> Dict:
+        """Labels added to every metric event (the current file, if any)"""
+        job = self.current_job()
+        if not job:
+            return {}
+        labels = {"file": Path(job.srt_file).name}
+        if job.target_language != self.target_language:
+            labels["language"] = job.target_language
+        return labels
+    
+    def export_metrics(self):
+        """Refresh cache gauges and write the Prometheus metrics file"""
+        if self.translation_memory:
+            stats = self.translation_memory.stats()
+            self.metrics.set_gauge("translation_memory_hit_rate", stats["hit_rate"])
+            self.metrics.set_gauge("translation_memory_entries", stats["entries"])
+        self.metrics.export_prometheus()
+    
+    def log_to_file(self, filename: str, content, mode: str = 'w', level: str = "full"):
+        """
+        Save content to a log file in the current job's (or the session) directory
+        
+        The file is only written if `level` ("errors", "summary" or "full") is
+        enabled by DEBUG_LOG_LEVEL. `content` may be a callable so expensive
+        dumps are only built when they will actually be written.
+        
+        Returns:
+            bool: True if the write was queued
+        """
+        if LOG_LEVELS[level] > self.log_level:
             return False
+        if callable(content):
+            content = content()
+        job = self.current_job()
+        filepath = (job.log_dir if job else self.session_dir) / filename
+        self.log_writer.write(filepath, content, mode)
+        return True
     
-    def parse_srt(self, srt_file: str) -> List[Dict]:
-        """Parse SRT file into structured data with timing and text"""
+    def parse_srt(self, srt_file: str) -> List[Cue]:
+        """Parse SRT file into Cue records (BOM, CRLF and legacy encodings are handled)"""
         print(f"📂 Reading SRT file: {srt_file}")
         
         try:
-            with open(srt_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            with open(srt_file, 'rb') as f:
+                content, encoding = decode_srt(f.read())
             
             # Save original SRT for debugging
             self.log_to_file("00_original_srt.txt", content)
@@ -110,81 +1762,99 @@ class SRTTranslator:
             print(f"❌ Error reading file: {e}")
             return []
         
-        # Split by double newlines to get subtitle blocks
-        blocks = re.split(r'\n\s*\n', content.strip())
-        subtitles = []
+        if encoding != 'utf-8':
+            print(f"🔤 Encoding: {encoding}")
+        if '\r' in content:
+            content = content.replace('\r\n', '\n')
+            if '\r' in content:
+                content = content.replace('\r', '\n')
         
-        for block in blocks:
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                index = lines[0].strip()
-                timing = lines[1].strip()
-                text = '\n'.join(lines[2:])
-                
-                subtitles.append({
-                    'index': index,
-                    'time': timing,
-                    'text': text
-                })
+        stats = {}
+        subtitles = parse_srt_text(content, stats)
         
+        if stats['renumbered']:
+            print(f"🔢 Renumbered {stats['renumbered']} subtitles with a missing or out-of-order index")
+        if stats['skipped_lines']:
+            print(f"⚠️ Skipped {stats['skipped_lines']} lines outside any subtitle")
         print(f"✅ Parsed {len(subtitles)} subtitle entries\n")
         
         # Save parsed structure
-        self.log_to_file("01_parsed_structure.json", 
-                        json.dumps(subtitles, ensure_ascii=False, indent=2))
+        self.log_to_file("01_parsed_structure.json",
+                        lambda: json.dumps([sub.to_dict() for sub in subtitles], ensure_ascii=False))
         
         return subtitles
     
-    def save_json_with_timing(self, subtitles: List[Dict], output_file: str) -> Dict:
-        """Save full JSON with timing information"""
-        json_data = {}
-        for sub in subtitles:
-            json_data[sub['index']] = {
-                'time': sub['time'],
-                'text': sub['text']
-            }
+    def iter_srt(self, srt_file: str):
+        """
+        Lazily parse an SRT file, one subtitle block at a time
+        
+        Yields:
+            Cue: every subtitle, exactly as parse_srt would return it
+        """
+        encoding = detect_srt_encoding(srt_file)
+        with open(srt_file, 'r', encoding=encoding, errors='replace') as f:
+            yield from iter_srt_cues(iter_file_blocks(f))
+    
+    def save_json_with_timing(self, subtitles: List[Cue], output_file: str, temp_dir: Path = None) -> Dict:
+        """
+        Save full JSON with timing information (into `temp_dir` if given)
+        
+        Returns:
+            dict: {index: Cue} of every subtitle
+        """
+        # Each value is encoded directly; no intermediate dict per subtitle
+        content = "{\n" + ",\n".join(
+            f'  {json.dumps(sub.index)}: {{"time": {json.dumps(sub.time)}, '
+            f'"text": {json.dumps(sub.text, ensure_ascii=False)}}}'
+            for sub in subtitles
+        ) + "\n}\n"
         
-        filepath = self.temp_dir / output_file
+        filepath = (temp_dir or self.temp_dir) / output_file
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=2)
+                f.write(content)
             print(f"💾 Saved full JSON with timing: {filepath}")
             
             # Also save to debug
-            self.log_to_file("02_json_with_timing.json",
-                           json.dumps(json_data, ensure_ascii=False, indent=2))
+            self.log_to_file("02_json_with_timing.json", content)
             
-            return json_data
+            return {sub.index: sub for sub in subtitles}
         except Exception as e:
             print(f"❌ Error saving JSON: {e}")
             return {}
     
-    def create_context_text(self, subtitles: List[Dict]) -> str:
+    def create_context_text(self, subtitles: List[Cue], chunk_info: str = "") -> str:
         """Create context text for AI to understand full content"""
-        context = '\n'.join([sub['text'] for sub in subtitles])
-        print(f"📝 Created context text: {len(context)} characters")
+        context = '\n'.join([sub.text for sub in subtitles])
+        print(f"📝 Created context text{chunk_info}: {len(context)} characters")
         
         # Save context
-        self.log_to_file("03_context_text.txt", context)
+        self.log_to_file(f"03_context_text{chunk_info}.txt", context)
         
         return context
     
-    def create_translation_json(self, subtitles: List[Dict]) -> Dict:
-        """Create JSON without timing for translation"""
-        json_data = {}
-        for sub in subtitles:
-            json_data[sub['index']] = {
-                'text': sub['text']
-            }
-        return json_data
+    def create_translation_json(self, subtitles: List[Cue]) -> Dict:
+        """Texts to translate, without timing: {index: text}"""
+        return {sub.index: sub.text for sub in subtitles}
     
     def build_translation_prompt(self, context: str, json_data: Dict, count: int) -> str:
         """Build the exact prompt for AI API"""
-        json_str = json.dumps(json_data, ensure_ascii=False, indent=2)
+        if self.prompt_mode == "compact":
+            return self.build_compact_prompt(json_data, count)
+        
+        json_str = json.dumps({index: {'text': text} for index, text in json_data.items()},
+                              ensure_ascii=False, indent=2)
+        target_language = self.current_language()
+        
+        # The glossary stands in for the raw context, keeping the prompt size bounded
+        glossary = self.current_glossary()
+        if glossary:
+            context = f"CONTEXT - Names, terms and story of the whole video:\n{glossary.to_prompt(target_language)}"
+        else:
+            context = f"CONTEXT - Full subtitle content for understanding the complete narrative:\n{context}"
         
-        prompt = f"""You are a professional subtitle translator specializing in {self.source_language} to {self.target_language} translation.
+        prompt = f"""You are a professional subtitle translator specializing in {self.source_language} to {target_language} translation.
 
-CONTEXT - Full subtitle content for understanding the complete narrative:
 {context}
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -192,7 +1862,7 @@ CONTEXT - Full subtitle content for understanding the complete narrative:
 ⚠️ CRITICAL REQUIREMENTS ⚠️
 
 1. YOU MUST RETURN EXACTLY {count} JSON OBJECTS
-2. EVERY INDEX from 1 to {count} MUST BE PRESENT
+2. EVERY INDEX in the JSON below MUST BE PRESENT
 3. DO NOT skip, combine, or delete ANY entries
 4. If text is empty, keep it empty - DO NOT delete the entry
 5. Return COMPLETE JSON - do not truncate or cut off the response
@@ -203,7 +1873,7 @@ Translation Guidelines:
 - Maintain subtitle timing-appropriate length
 - Keep tone and style consistent
 - Preserve line breaks within subtitles
-- Use commonly accepted {self.target_language} equivalents for technical terms
+- Use commonly accepted {target_language} equivalents for technical terms
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -222,103 +1892,465 @@ RESPONSE FORMAT:
 
 FINAL CHECK:
 ✓ Does response have exactly {count} entries?
-✓ Are all indices from 1 to {count} present?
+✓ Are all indices from the input JSON present?
 ✓ Is the JSON valid and COMPLETE?
 ✓ Does it end with proper closing braces?"""
         
         return prompt
     
-    def call_ai_api(self, prompt: str, chunk_info: str = "", retry_count: int = 0) -> str:
-        """Call the Avalai.ir API with the given prompt"""
+    def build_compact_prompt(self, json_data: Dict, count: int) -> str:
+        """Build a minimal prompt that sends each subtitle once, one per line"""
+        if self.uses_line_format():
+            return self.build_lines_prompt(json_data, count)
+        
+        lines = [
+            f"{json.dumps(index)}:{json.dumps(text, ensure_ascii=False)}"
+            for index, text in json_data.items()
+        ]
+        entries = ",\n".join(lines)
+        target_language = self.current_language()
+        glossary = self.format_glossary_section(target_language)
+        
+        return f"""Translate these {count} {self.source_language} subtitles into {target_language}. They are consecutive lines of the same video, in order - use them as context for each other.
+
+Rules:
+- Return exactly {count} entries with the same keys; never skip, merge or split entries
+- Keep empty texts empty and preserve line breaks (\\n)
+- Natural, concise {target_language} that fits subtitle timing; keep tone and names consistent
+- Return ONLY valid, complete JSON (no markdown): {{"<index>": {{"text": "<translation>"}}, ...}}
+
+{glossary}{{
+{entries}
+}}"""
+    
+    def build_lines_prompt(self, json_data: Dict, count: int) -> str:
+        """Build a compact prompt whose subtitles and answer are "index<TAB>text" lines"""
+        entries = "\n".join(
+            f"{index}\t{escape_line_text(text)}"
+            for index, text in json_data.items()
+        )
+        target_language = self.current_language()
+        glossary = self.format_glossary_section(target_language)
+        
+        return f"""Translate these {count} {self.source_language} subtitles into {target_language}. They are consecutive lines of the same video, in order - use them as context for each other.
+
+Rules:
+- Each subtitle is one line: <index><TAB><text>, with line breaks inside it written as \\n
+- Answer with exactly {count} lines in the same format, same indices and order; never skip, merge or split entries
+- Keep empty texts empty and keep the \\n line breaks
+- Natural, concise {target_language} that fits subtitle timing; keep tone and names consistent
+- Return ONLY these lines (no markdown, no commentary), then a last line containing only {LineEntryParser.END_MARKER}
+
+{glossary}{entries}"""
+    
+    def current_glossary(self):
+        """Glossary of the job this thread is working on, or None"""
+        job = self.current_job()
+        return job.glossary if job else None
+    
+    def format_glossary_section(self, target_language: str) -> str:
+        """The current glossary as a compact prompt section (empty without one)"""
+        glossary = self.current_glossary()
+        return f"{glossary.to_prompt(target_language)}\n\n" if glossary else ""
+    
+    def uses_line_format(self) -> bool:
+        """Whether responses are "index<TAB>text" lines (only compact prompts ask for them)"""
+        if getattr(self._local, 'json_response', False):
+            return False  # A request that is not a chunk (the glossary pre-pass) always answers in JSON
+        return self.response_format == "lines" and self.prompt_mode == "compact"
+    
+    def create_response_parser(self):
+        """Incremental parser for the response format the prompts ask for"""
+        return LineEntryParser() if self.uses_line_format() else JSONEntryParser()
+    
+    def call_ai_api(self, prompt: str, chunk_info: str = "", expected_count: int = 0,
+                    response_tokens: int = None):
+        """
+        Call the Avalai.ir API with the given prompt, retrying transient failures
+        
+        `expected_count` (the number of entries requested) lets a streamed
+        response stop as soon as every entry has arrived. With several
+        backends, a failed attempt is retried on a different one.
+        `response_tokens` is the expected response size (MAX_OUTPUT_TOKENS if
+        unknown); providers count it against the tokens-per-minute quota too.
+        
+        Returns:
+            tuple: (response text, or "" on failure; model of the backend that
+                    answered, or of the last one tried)
+        """
+        # Reserve the whole request in the rate limit budget; it is settled against the reported usage
+        expected_response = self.max_output_tokens if response_tokens is None else response_tokens
+        request_tokens = estimate_tokens(prompt) + min(expected_response, self.max_output_tokens)
+        total_attempts = self.max_retries + 1
+        backend = None
+        
+        for attempt in range(1, total_attempts + 1):
+            # Save prompt for debugging
+            self.log_to_file(f"04_prompt_{chunk_info}attempt{attempt}.txt", prompt)
+            
+            outcome = self.dispatch_request(prompt, request_tokens, chunk_info, expected_count,
+                                            attempt, total_attempts, avoid=backend)
+            backend = outcome["backend"]
+            if outcome["content"] is not None:
+                job = self.current_job()
+                if job:
+                    job.count_response(backend.model)
+                return outcome["content"], backend.model
+            if outcome["fatal"]:
+                return "", backend.model
+            
+            if attempt == total_attempts:
+                break
+            
+            job = self.current_job()
+            retry_budget = job.retry_budget if job else self.retry_budget
+            if not retry_budget.take():
+                print(f"❌ Retry budget for this file is exhausted ({retry_budget.limit} retries)")
+                return "", backend.model
+            
+            self.metrics.incr("retries", reason=outcome["reason"])
+            retry_after = outcome["retry_after"]
+            if retry_after is not None:
+                # Hold back every request to this backend, not just this one, while it is throttling
+                backend.rate_limiter.pause(retry_after)
+                print(f"⏳ Server asked to retry after {retry_after:.1f} seconds")
+            
+            # Another healthy backend can take the retry right away
+            if self.providers.has_alternative(backend):
+                print(f"🔀 Failing over from backend '{backend.name}'...")
+                continue
+            
+            delay = backoff_delay(attempt, self.retry_delay, self.max_retry_delay, retry_after)
+            print(f"⏳ Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+        
+        return "", backend.model
+    
+    def dispatch_request(self, prompt: str, request_tokens: int, chunk_info: str, expected_count: int,
+                         attempt: int, total_attempts: int, avoid: Backend = None) -> Dict:
+        """
+        Send one attempt, hedging it with a duplicate request if it is slower than usual
+        
+        The hedge goes to a different backend when one is available; whichever
+        request succeeds first wins and the other is left to finish unused.
+        """
+        backend = self.providers.acquire(avoid)
+        hedge_after = None
+        if self.hedge_requests:
+            hedge_after = self.providers.latency_percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+        if hedge_after is None:
+            return self.send_request(backend, prompt, request_tokens, chunk_info, expected_count,
+                                     f"attempt{attempt}", f"(Attempt {attempt}/{total_attempts})")
+        
+        job = self.current_job()
+        chunk_issues = getattr(self._local, 'chunk_issues', None)
+        json_response = getattr(self._local, 'json_response', False)
+        
+        def send_in_background(backend, label, note) -> Future:
+            # A plain thread per request, so a losing request never holds up later ones
+            future = Future()
+            
+            def run():
+                self._local.chunk_issues = chunk_issues
+                self._local.json_response = json_response
+                with self.job_context(job):
+                    try:
+                        future.set_result(self.send_request(backend, prompt, request_tokens, chunk_info,
+                                                            expected_count, label, note))
+                    except BaseException as e:
+                        future.set_exception(e)
+            
+            threading.Thread(target=run, name=f"request{chunk_info}{label}", daemon=True).start()
+            return future
+        
+        primary = send_in_background(backend, f"attempt{attempt}", f"(Attempt {attempt}/{total_attempts})")
+        try:
+            return primary.result(timeout=hedge_after)
+        except FutureTimeoutError:
+            pass
         
-        # Save prompt for debugging
-        prompt_filename = f"04_prompt_{chunk_info}attempt{retry_count+1}.txt"
-        self.log_to_file(prompt_filename, prompt)
+        # Too many hedges already outstanding: just wait for the original request
+        if not self.hedge_slots.acquire(blocking=False):
+            return primary.result()
         
+        hedge_backend = self.providers.acquire(avoid=backend)
+        print(f"🪞 No response{describe_chunk(chunk_info)} after {hedge_after:.1f}s - hedging on backend '{hedge_backend.name}'")
+        self.metrics.incr("hedged_requests")
+        hedge = send_in_background(hedge_backend, f"attempt{attempt}_hedge",
+                                   f"(Attempt {attempt}/{total_attempts}, hedged)")
+        hedge.add_done_callback(lambda _: self.hedge_slots.release())
+        
+        pending = {primary, hedge}
+        outcome = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcome = future.result()
+                if outcome["content"] is not None:
+                    if future is hedge:
+                        self.metrics.incr("hedge_wins")
+                    return outcome
+        return outcome
+    
+    def send_request(self, backend: Backend, prompt: str, request_tokens: int, chunk_info: str,
+                     expected_count: int, label: str, note: str) -> Dict:
+        """
+        Send one request to one backend and classify the result
+        
+        Returns:
+            dict: 'content' (the response text, or None on failure), 'fatal'
+                  (not worth retrying), 'retry_after', 'reason' and 'backend'
+        """
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {backend.api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "model": self.model_name,
+            "model": backend.model,
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": self.max_output_tokens,
             "temperature": self.temperature,
             "top_p": self.top_p
         }
+        if self.stream_responses:
+            payload["stream"] = True
+            # Token usage is only reported in a final chunk when asked for
+            payload["stream_options"] = {"include_usage": True}
+        
+        outcome = {"content": None, "fatal": False, "retry_after": None, "reason": None, "backend": backend}
+        healthy = False
+        pooled = len(self.providers.backends) > 1
+        via = f" via {backend.name}" if pooled else ""
         
-        # Save request payload
-        request_filename = f"05_request_{chunk_info}attempt{retry_count+1}.json"
-        self.log_to_file(request_filename,
-                        json.dumps(payload, ensure_ascii=False, indent=2))
+        # Save request payload for debugging
+        self.log_to_file(f"05_request_{chunk_info}{label}.json",
+                        lambda: json.dumps(payload, ensure_ascii=False))
         
+        # Wait for room in the backend's rate limit budget before sending
+        waited = backend.rate_limiter.acquire(request_tokens)
+        if waited > 0:
+            self.metrics.observe("rate_limit_wait", waited, chunk=chunk_info.strip("_"), backend=backend.name)
+        if waited >= 1:
+            print(f"⏳ Rate limit pacing{describe_chunk(chunk_info)}: waited {waited:.1f} seconds")
+        
+        api_started = time.perf_counter()
         try:
-            print(f"🚀 Calling API{chunk_info}... (Attempt {retry_count + 1}/{self.max_retries + 1})")
+            print(f"🚀 Calling API{chunk_info}{via}... {note}")
             
-            response = requests.post(
-                self.api_endpoint, 
-                headers=headers, 
-                json=payload, 
-                timeout=300  # Increased timeout
-            )
+            response = self.transport.post(backend.endpoint, headers, payload,
+                                           stream=self.stream_responses)
+            streamed = self.stream_responses and response.status_code == 200
+            
+            if streamed:
+                content, stream_stats = self.read_streamed_response(
+                    response, chunk_info, expected_count, len(prompt))
+            
+            latency = time.perf_counter() - api_started
+            self.metrics.observe("api", latency, chunk=chunk_info.strip("_"),
+                                 status=response.status_code, backend=backend.name)
+            self.metrics.incr("requests", status=response.status_code, backend=backend.name)
             
             # Save full response for debugging
-            response_filename = f"06_response_{chunk_info}attempt{retry_count+1}.txt"
-            response_data = {
-                "status_code": response.status_code,
-                "headers": dict(response.headers),
-                "content": response.text
-            }
-            self.log_to_file(response_filename,
-                           json.dumps(response_data, ensure_ascii=False, indent=2))
+            self.log_to_file(f"06_response_{chunk_info}{label}.txt",
+                           lambda: json.dumps({
+                               "backend": backend.name,
+                               "status_code": response.status_code,
+                               "headers": dict(response.headers),
+                               "content": stream_stats if streamed else response.text
+                           }, ensure_ascii=False))
             
             if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content'].strip()
+                if not streamed:
+                    result = response.json()
+                    content = result['choices'][0]['message']['content'].strip()
+                    usage = result.get('usage') or {}
+                else:
+                    usage = stream_stats.get('usage') or {}
+                
+                # Token usage as reported by the provider
+                used_tokens = 0
+                for token_type in ("prompt_tokens", "completion_tokens"):
+                    if isinstance(usage.get(token_type), (int, float)):
+                        used_tokens += usage[token_type]
+                        self.metrics.incr("tokens", usage[token_type], chunk=chunk_info.strip("_"),
+                                          type=token_type.replace("_tokens", ""), backend=backend.name)
+                if used_tokens:
+                    backend.rate_limiter.settle(request_tokens, used_tokens)
                 
                 # Save just the content for easy review
-                content_filename = f"07_api_content_{chunk_info}attempt{retry_count+1}.txt"
-                self.log_to_file(content_filename, content)
+                self.log_to_file(f"07_api_content_{chunk_info}{label}.txt", content)
                 
-                print(f"✅ API response received ({len(content)} characters)")
+                print(f"✅ API response received{via} ({len(content)} characters)")
                 
                 # Check if response looks truncated
-                if not content.rstrip().endswith('}'):
-                    print(f"⚠️ Warning: Response may be truncated (doesn't end with }}")
-                    self.log_to_file("warning_truncated.txt", 
-                                   f"Response appears truncated:\n{content[-200:]}")
+                end_marker = LineEntryParser.END_MARKER if self.uses_line_format() else '}'
+                if not content.rstrip('`\n ').endswith(end_marker):
+                    print(f"⚠️ Warning: Response may be truncated (doesn't end with {end_marker})")
+                    self.note_chunk_issue("truncated")
+                    self.log_to_file(f"warning_truncated{chunk_info}.txt",
+                                   f"Response appears truncated:\n{content[-200:]}", level="errors")
                 
-                return content
+                self.providers.release(backend, True, latency)
+                outcome["content"] = content
+                return outcome
+            
+            print(f"❌ API Error{via}: Status {response.status_code}")
+            print(f"   Response: {response.text[:200]}")
+            
+            # Save error
+            self.log_to_file(f"error_{chunk_info}{label}.txt",
+                           f"Backend: {backend.name}\nStatus: {response.status_code}\n{response.text}",
+                           level="errors")
+            
+            outcome["reason"] = str(response.status_code)
+            if not is_retryable_status(response.status_code):
+                # A rejected key or unknown model only affects this backend; other
+                # client errors are about the request, not the backend's health
+                if response.status_code in (401, 403, 404):
+                    if pooled:
+                        self.providers.trip(backend)
+                else:
+                    healthy = True
+                if not (pooled and self.providers.has_alternative(backend)):
+                    print(f"❌ Status {response.status_code} is not retryable - giving up")
+                    outcome["fatal"] = True
             else:
-                print(f"❌ API Error: Status {response.status_code}")
-                print(f"   Response: {response.text[:200]}")
+                outcome["retry_after"] = parse_retry_after(response.headers.get("Retry-After"))
                 
-                # Save error
-                self.log_to_file(f"error_{chunk_info}attempt{retry_count+1}.txt",
-                               f"Status: {response.status_code}\n{response.text}")
-                
-                if retry_count < self.max_retries:
-                    print(f"⏳ Retrying in {self.retry_delay} seconds...")
-                    time.sleep(self.retry_delay)
-                    return self.call_ai_api(prompt, chunk_info, retry_count + 1)
-                return ""
-                    
         except Exception as e:
-            print(f"❌ Error in API call: {str(e)}")
+            print(f"❌ Error in API call{via}: {str(e)}")
+            self.metrics.incr("requests", status=type(e).__name__, backend=backend.name)
+            outcome["reason"] = type(e).__name__
             
             # Save exception
-            self.log_to_file(f"exception_{chunk_info}attempt{retry_count+1}.txt",
-                           f"Exception: {str(e)}\n{type(e)}")
+            self.log_to_file(f"exception_{chunk_info}{label}.txt",
+                           f"Backend: {backend.name}\nException: {str(e)}\n{type(e)}", level="errors")
             
-            if retry_count < self.max_retries:
-                print(f"⏳ Retrying in {self.retry_delay} seconds...")
-                time.sleep(self.retry_delay)
-                return self.call_ai_api(prompt, chunk_info, retry_count + 1)
-            return ""
+            if isinstance(e, requests.exceptions.Timeout):
+                self.note_chunk_issue("timeout")
+            if not is_retryable_exception(e):
+                print(f"❌ {type(e).__name__} is not retryable - giving up")
+                outcome["fatal"] = True
+        
+        self.providers.release(backend, healthy)
+        return outcome
     
-    def extract_json_from_response(self, response: str, chunk_info: str = "") -> Dict:
-        """Extract JSON from AI response (handles markdown code blocks)"""
+    def read_streamed_response(self, response: requests.Response, chunk_info: str,
+                               expected_count: int, prompt_chars: int):
+        """
+        Read a Server-Sent Events completion, parsing entries as they arrive
+        
+        Stops early when the stream stalls (no data for STREAM_STALL_TIMEOUT),
+        when every expected entry has arrived but generation continues, or when
+        the output runs away (much longer than the prompt, or looping). Whatever
+        was received is returned so complete entries can still be used.
+        
+        Returns:
+            tuple: (content, stream statistics for the debug log)
+        """
+        started = time.monotonic()
+        first_token = None
+        stop_reason = "completed"
+        usage = None
+        bad_events = 0
+        parser = self.create_response_parser()
+        max_chars = int(prompt_chars * STREAM_RUNAWAY_FACTOR)
+        next_loop_check = 2000
+        
+        try:
+            for raw_line in iter_response_lines(response):
+                # Events are UTF-8 whatever the headers say; decoding each line (not the
+                # stream) also stops characters such as U+0085 from splitting lines
+                line = raw_line.decode('utf-8', errors='replace')
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                
+                try:
+                    event = json.loads(data)
+                except ValueError:
+                    # One garbled event should not discard everything received so far
+                    bad_events += 1
+                    continue
+                if not isinstance(event, dict):
+                    bad_events += 1
+                    continue
+                if event.get("usage"):
+                    usage = event["usage"]
+                choices = event.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if not delta:
+                    continue
+                
+                if first_token is None:
+                    first_token = time.monotonic() - started
+                    self.metrics.observe("ttft", first_token, chunk=chunk_info.strip("_"))
+                    print(f"⏱️ First token{describe_chunk(chunk_info)} after {first_token:.1f} seconds")
+                parser.feed(delta)
+                text = parser.buffer
+                
+                # All entries are in, but the model keeps generating
+                if (expected_count and len(parser.entries) >= expected_count
+                        and len(text) - parser.pos > 200):
+                    stop_reason = "all entries received, extra output discarded"
+                    break
+                
+                # Runaway output: far longer than the prompt, or repeating itself
+                if len(text) > max_chars:
+                    stop_reason = f"runaway output (over {max_chars} characters)"
+                    break
+                if len(text) >= next_loop_check:
+                    next_loop_check += 2000
+                    if text[-2000:].count(text[-80:]) >= 4:
+                        stop_reason = "runaway output (repeating itself)"
+                        break
+                
+                if time.monotonic() - started > self.transport.timeout[1]:
+                    stop_reason = "read timeout"
+                    break
+        except requests.exceptions.RequestException as e:
+            # Nothing usable arrived: let the retry policy handle it
+            if not parser.entries:
+                raise
+            stop_reason = f"stream stalled ({type(e).__name__})"
+        finally:
+            response.close()
+        
+        elapsed = time.monotonic() - started
+        if bad_events:
+            print(f"⚠️ Skipped {bad_events} unreadable stream events{describe_chunk(chunk_info)}")
+        if stop_reason != "completed":
+            print(f"⚠️ Stream stopped early{describe_chunk(chunk_info)}: {stop_reason} "
+                  f"- keeping {len(parser.entries)} complete entries")
+        
+        content = parser.buffer.strip()
+        if stop_reason.startswith("all entries"):
+            # Close the response so the complete entries parse normally
+            content = parser.completed_text()
+        
+        stream_stats = {
+            "streamed": True,
+            "stop_reason": stop_reason,
+            "time_to_first_token": round(first_token, 3) if first_token is not None else None,
+            "total_seconds": round(elapsed, 3),
+            "characters": len(parser.buffer),
+            "entries": len(parser.entries),
+            "bad_events": bad_events,
+            "usage": usage
+        }
+        return content, stream_stats
+    
+    def extract_json_from_response(self, response: str, chunk_info: str = "", expected=None) -> Dict:
+        """
+        Extract JSON from AI response (handles markdown code blocks)
+        
+        If the response is not valid JSON (usually because it was truncated),
+        every complete entry is recovered and the `expected` indices that
+        could not be recovered are reported.
+        """
         
         # Save original response
         self.log_to_file(f"08_raw_response_{chunk_info}.txt", response)
@@ -339,7 +2371,7 @@ FINAL CHECK:
         try:
             parsed = json.loads(response)
             self.log_to_file(f"10_parsed_json_{chunk_info}.json",
-                           json.dumps(parsed, ensure_ascii=False, indent=2))
+                           lambda: json.dumps(parsed, ensure_ascii=False))
             return parsed
         except json.JSONDecodeError as e:
             print(f"❌ JSON Parse Error: {e}")
@@ -359,19 +2391,54 @@ Response Start: {response[:500]}
 ...
 Response End: {response[-500:]}
 """
-            self.log_to_file(f"error_json_parse_{chunk_info}.txt", error_info)
+            self.log_to_file(f"error_json_parse_{chunk_info}.txt", error_info, level="errors")
             
-            # Try to find JSON object in response
-            match = re.search(r'\{.*\}', response, re.DOTALL)
-            if match:
-                try:
-                    extracted = json.loads(match.group(0))
-                    print(f"✓ Recovered partial JSON with {len(extracted)} entries")
-                    return extracted
-                except:
-                    pass
+            # Recover every complete entry from the truncated or malformed response
+            parser = JSONEntryParser()
+            parser.feed(response)
+            extracted = parser.close()
+            if extracted:
+                print(f"✓ Recovered partial JSON with {len(extracted)} entries"
+                      f" ({parser.skipped} malformed entries skipped)")
             
-            return {}
+            if expected is not None:
+                lost = sorted(set(expected) - set(extracted), key=lambda x: int(x))
+                if lost:
+                    print(f"   Not recovered: {len(lost)} indices {lost[:20]}{'...' if len(lost) > 20 else ''}")
+                    self.log_to_file(f"error_json_unrecovered_{chunk_info}.txt",
+                                   f"Recovered: {len(extracted)}\nNot recovered ({len(lost)}): {lost}", level="errors")
+            
+            return extracted
+    
+    def extract_lines_from_response(self, response: str, chunk_info: str = "", expected=None) -> Dict:
+        """
+        Extract entries from a line-oriented ("index<TAB>text") response
+        
+        Every complete line is kept, so a truncated response only loses the
+        line it was cut in; the `expected` indices that are missing are reported.
+        """
+        self.log_to_file(f"08_raw_response_{chunk_info}.txt", response)
+        
+        parser = LineEntryParser()
+        parser.feed(response.strip())
+        extracted = parser.close()
+        self.log_to_file(f"10_parsed_json_{chunk_info}.json",
+                       lambda: json.dumps(extracted, ensure_ascii=False))
+        
+        if not parser.ended:
+            print(f"⚠️ Response has no {LineEntryParser.END_MARKER} line - it may be truncated")
+        if parser.skipped:
+            print(f"⚠️ Skipped {parser.skipped} lines that are not \"index<TAB>text\"")
+        
+        if expected is not None:
+            lost = sorted(set(expected) - set(extracted), key=lambda x: int(x))
+            if lost:
+                print(f"   Not recovered: {len(lost)} indices {lost[:20]}{'...' if len(lost) > 20 else ''}")
+                self.log_to_file(f"error_lines_unrecovered_{chunk_info}.txt",
+                               f"Recovered: {len(extracted)}\nNot recovered ({len(lost)}): {lost}\n\n"
+                               f"Response End: {response[-500:]}", level="errors")
+        
+        return extracted
     
     def validate_translation(self, original: Dict, translated: Dict, chunk_info: str = "") -> bool:
         """Validate that translation has exact same structure"""
@@ -403,7 +2470,7 @@ Response End: {response[-500:]}
             
             # Save validation failure details
             self.log_to_file(f"validation_failed_{chunk_info}.txt",
-                           "\n".join(validation_log))
+                           "\n".join(validation_log), level="errors")
             
             return False
         
@@ -416,103 +2483,356 @@ Response End: {response[-500:]}
             print(f"❌ MISSING KEYS: {missing_keys[:10]}...")
             validation_log.append(f"Missing keys: {missing_keys}")
             self.log_to_file(f"validation_failed_{chunk_info}.txt",
-                           "\n".join(validation_log))
+                           "\n".join(validation_log), level="errors")
             return False
         
-        print(f"✅ Validation passed: {len(translated)} entries matched perfectly")
-        validation_log.append("✅ VALIDATION PASSED")
-        self.log_to_file(f"validation_success_{chunk_info}.txt",
-                       "\n".join(validation_log))
-        return True
+        print(f"✅ Validation passed: {len(translated)} entries matched perfectly")
+        validation_log.append("✅ VALIDATION PASSED")
+        self.log_to_file(f"validation_success_{chunk_info}.txt",
+                       "\n".join(validation_log))
+        return True
+    
+    def estimate_subtitle_tokens(self, sub: Cue):
+        """Estimated (prompt, response) tokens one subtitle adds to a chunk"""
+        text_tokens = estimate_tokens(sub.text)
+        # Index/"text" key framing costs a few tokens per entry (fewer as a line)
+        framing = (2 if self.uses_line_format() else 8) + len(sub.index) // 3
+        # Full prompts send the text twice: once as context, once in the JSON
+        copies = 1 if self.prompt_mode == "compact" else 2
+        prompt_tokens = copies * text_tokens + framing
+        response_tokens = int(text_tokens * OUTPUT_TOKEN_RATIO) + framing
+        return prompt_tokens, response_tokens
+    
+    def chunk_output_budget(self) -> int:
+        """Estimated response tokens allowed per chunk (learned when adaptive)"""
+        if self.chunk_sizer:
+            return self.chunk_sizer.budget
+        return min(CHUNK_OUTPUT_TOKEN_BUDGET, int(self.max_output_tokens * 0.8))
+    
+    def iter_chunks(self, subtitles):
+        """
+        Pack subtitles into chunks that fit the token budgets
+        
+        When a chunk is full it is cut at the last scene change (a long pause
+        between subtitles) if that leaves the chunk at least half full, so
+        chunks tend to hold whole scenes. The budgets are re-read for every
+        subtitle, so a lazily consumed generator follows the adaptive chunk size.
+        
+        Yields:
+            List[Cue]: chunks of subtitles, in order
+        """
+        base_budget = min(CHUNK_OUTPUT_TOKEN_BUDGET, int(self.max_output_tokens * 0.8))
+        input_budget = CHUNK_INPUT_TOKEN_BUDGET
+        scene_gap_ms = int(SCENE_GAP_SECONDS * 1000)
+        
+        chunk, costs = [], []
+        scene_cut = None  # Position in `chunk` where the latest scene starts
+        previous_end = None
+        
+        def fill(items):
+            return max(sum(c[0] for c in items) / input_budget,
+                       sum(c[1] for c in items) / output_budget,
+                       len(items) / max_count)
+        
+        for sub in subtitles:
+            # A shrunken budget also lowers the subtitle count limit proportionally
+            output_budget = self.chunk_output_budget()
+            max_count = max(1, round(self.max_chunk_size * min(1.0, output_budget / base_budget)))
+            
+            cost = self.estimate_subtitle_tokens(sub)
+            start, end = sub.span
+            new_scene = (previous_end is not None and start is not None
+                         and start - previous_end >= scene_gap_ms)
+            previous_end = end if end is not None else previous_end
+            
+            while chunk and fill(costs + [cost]) > 1:
+                if scene_cut and fill(costs[:scene_cut]) >= 0.5:
+                    yield chunk[:scene_cut]
+                    chunk, costs = chunk[scene_cut:], costs[scene_cut:]
+                else:
+                    yield chunk
+                    chunk, costs = [], []
+                scene_cut = None
+            
+            if chunk and new_scene:
+                scene_cut = len(chunk)
+            chunk.append(sub)
+            costs.append(cost)
+        
+        if chunk:
+            yield chunk
     
-    def translate_chunk(self, subtitles: List[Dict], chunk_num: int = 0, total_chunks: int = 1) -> Dict:
+    def plan_chunks(self, subtitles: List[Cue]) -> List[List[Cue]]:
+        """Split subtitles into token-budgeted chunks"""
+        if not self.enable_chunking:
+            return [subtitles]
+        return list(self.iter_chunks(subtitles))
+    
+    def translate_chunk(self, subtitles: List[Cue], chunk_num: int = 0, total_chunks: int = 1) -> Dict:
         """Translate a single chunk of subtitles"""
         
-        chunk_info = f"_chunk{chunk_num+1}of{total_chunks}_" if total_chunks > 1 else ""
+        # total_chunks is 0 when it is not known in advance (streaming mode)
+        if total_chunks == 0:
+            chunk_info = f"_chunk{chunk_num+1}_"
+        else:
+            chunk_info = f"_chunk{chunk_num+1}of{total_chunks}_" if total_chunks > 1 else ""
         
         print(f"\n{'─'*70}")
-        if total_chunks > 1:
-            print(f"📦 PROCESSING CHUNK {chunk_num+1}/{total_chunks} ({len(subtitles)} subtitles)")
+        if total_chunks != 1:
+            print(f"📦 PROCESSING CHUNK {chunk_num+1}/{total_chunks or '?'} ({len(subtitles)} subtitles)")
         print(f"{'─'*70}")
         
-        # Create context text
-        context = self.create_context_text(subtitles)
+        # Reuse remembered translations and only send the rest
+        cached = self.lookup_translation_memory(subtitles)
+        pending = [sub for sub in subtitles if sub.index not in cached]
+        if cached:
+            print(f"🧠 Translation memory: {len(cached)}/{len(subtitles)} subtitles reused")
+        if not pending:
+            return cached
         
-        # Create translation JSON
-        translation_json = self.create_translation_json(subtitles)
-        print(f"📊 Created translation JSON: {len(translation_json)} entries")
+        # Create context text (the whole chunk, including remembered lines);
+        # compact prompts skip it since every line is already in the JSON,
+        # and a glossary replaces it
+        context = ""
+        if self.prompt_mode != "compact" and not self.current_glossary():
+            context = self.create_context_text(subtitles, chunk_info)
         
-        # Build prompt
-        prompt = self.build_translation_prompt(context, translation_json, len(subtitles))
-        print(f"✅ Prompt ready: {len(prompt)} characters")
+        # Translate, then re-request only the entries that came back missing or malformed
+        translated = {}
+        remaining = pending
+        started = time.perf_counter()
+        issues = set()  # Signs the chunk was too large (see note_chunk_issue)
+        models = []  # Model of each request, the first one sized by the chunk
+        self._local.chunk_issues = issues
+        try:
+            remaining = self.translate_entries(context, remaining, translated, chunk_info, issues, models)
+        finally:
+            self._local.chunk_issues = None
         
-        # Call API
-        response = self.call_ai_api(prompt, chunk_info)
+        if self.chunk_sizer and models:
+            chunk_tokens = sum(self.estimate_subtitle_tokens(sub)[1] for sub in pending)
+            self.chunk_sizer.record(models[0], chunk_tokens, time.perf_counter() - started, issues)
         
-        if not response:
-            print(f"❌ Translation failed - no response from API")
+        if remaining:
+            print(f"❌ Validation failed - {len(remaining)} entries could not be translated")
+            self.metrics.incr("chunks", result="failed")
             return {}
         
-        # Extract JSON
-        translated_json = self.extract_json_from_response(response, chunk_info)
+        self.metrics.incr("chunks", result="translated")
         
-        if not translated_json:
-            print(f"❌ Failed to extract valid JSON from response")
-            return {}
+        translated.update(cached)
         
-        print(f"✅ Extracted {len(translated_json)} translated entries")
+        return translated
+    
+    def translate_entries(self, context: str, remaining: List[Cue], translated: Dict,
+                          chunk_info: str, issues: set, models: List[str]) -> List[Cue]:
+        """
+        Request translations, then re-request only entries that came back missing or malformed
+        
+        Valid entries are added to `translated` and the model of every request
+        to `models`; the entries still missing after the last salvage round
+        are returned.
+        """
+        for round_num in range(self.max_salvage_rounds + 1):
+            round_info = chunk_info if round_num == 0 else f"{chunk_info}salvage{round_num}_"
+            if round_num > 0:
+                print(f"🩹 Re-requesting {len(remaining)} missing entries{describe_chunk(chunk_info)}, "
+                      f"round {round_num}/{self.max_salvage_rounds}")
+            
+            # Create translation JSON
+            translation_json = self.create_translation_json(remaining)
+            print(f"📊 Created translation JSON: {len(translation_json)} entries")
+            
+            # Build prompt
+            with self.metrics.timer("prompt_build", chunk=round_info.strip("_")):
+                prompt = self.build_translation_prompt(context, translation_json, len(remaining))
+            print(f"✅ Prompt ready: {len(prompt)} characters")
+            
+            # Call API
+            response, model = self.call_ai_api(prompt, round_info, len(remaining),
+                                               sum(self.estimate_subtitle_tokens(sub)[1] for sub in remaining))
+            models.append(model)
+            
+            if not response:
+                print(f"❌ Translation failed - no response from API")
+                break
+            
+            # Extract JSON (or lines)
+            extract = self.extract_lines_from_response if self.uses_line_format() else self.extract_json_from_response
+            with self.metrics.timer("json_extract", chunk=round_info.strip("_")):
+                translated_json = extract(response, round_info, translation_json.keys())
+            
+            if not translated_json:
+                print(f"❌ Failed to extract valid JSON from response")
+                issues.add("malformed")
+                continue
+            
+            print(f"✅ Extracted {len(translated_json)} translated entries")
+            
+            # Validate, keeping every well-formed entry even if others are missing
+            with self.metrics.timer("validation", chunk=round_info.strip("_")):
+                self.validate_translation(translation_json, translated_json, round_info)
+                valid = self.collect_valid_entries(translation_json, translated_json)
+            translated.update(valid)
+            self.store_translation_memory(remaining, valid, model)
+            
+            remaining = [sub for sub in remaining if sub.index not in valid]
+            if not remaining:
+                break
+            issues.add("incomplete")
+            self.metrics.incr("salvage_rounds")
+            print(f"🩹 Kept {len(valid)} valid entries, {len(remaining)} still missing")
         
-        # Validate
-        if not self.validate_translation(translation_json, translated_json, chunk_info):
-            print(f"❌ Validation failed - translation incomplete")
+        return remaining
+    
+    def collect_valid_entries(self, original: Dict, translated: Dict) -> Dict:
+        """Keep translated entries whose index was requested and whose text is a string"""
+        valid = {}
+        for index, entry in translated.items():
+            if index not in original:
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get('text'), str):
+                valid[index] = {'text': entry['text']}
+            elif isinstance(entry, str):
+                # Lightly malformed: {"5": "text"} instead of {"5": {"text": "text"}}
+                valid[index] = {'text': entry}
+        return valid
+    
+    def lookup_translation_memory(self, subtitles: List[Cue]) -> Dict:
+        """Return remembered translations for these subtitles, keyed by index"""
+        if not self.translation_memory:
             return {}
+        # Any model that may serve this chunk counts, the primary one first
+        remembered = {}
+        missing = subtitles
+        for model in self.providers.models():
+            keys = [self.memory_key(sub.text, model) for sub in missing]
+            found = self.translation_memory.get_many(keys, count=False)
+            remembered.update((sub.index, {'text': found[key]}) for sub, key in zip(missing, keys) if key in found)
+            missing = [sub for sub in missing if sub.index not in remembered]
+            if not missing:
+                break
+        hits = sum(1 for sub in subtitles if sub.index in remembered)
+        self.translation_memory.record_lookups(hits, len(subtitles) - hits)
+        self.metrics.incr("translation_memory_lookups", hits, result="hit")
+        self.metrics.incr("translation_memory_lookups", len(subtitles) - hits, result="miss")
+        return remembered
+    
+    def store_translation_memory(self, subtitles: List[Cue], translated: Dict, model: str):
+        """Remember validated translations (by the model that produced them) for later chunks, files and runs"""
+        if not self.translation_memory:
+            return
+        items = {}
+        for sub in subtitles:
+            entry = translated.get(sub.index)
+            if isinstance(entry, dict) and isinstance(entry.get('text'), str):
+                items[self.memory_key(sub.text, model)] = entry['text']
+        self.translation_memory.put_many(items)
+    
+    def memory_key(self, text: str, model: str) -> str:
+        """Translation memory key for a subtitle text translated by `model` under the current settings"""
+        return TranslationMemory.make_key(text, model, self.source_language, self.current_language())
+    
+    def deduplicate_subtitles(self, subtitles: List[Cue]):
+        """
+        Collapse subtitles with identical (normalized) text
+        
+        Returns:
+            tuple: (unique subtitles to translate, {duplicate index: index it copies})
+        """
+        unique = []
+        duplicates = {}
+        first_index = {}
+        for sub in subtitles:
+            key = normalize_text(sub.text)
+            if key in first_index:
+                duplicates[sub.index] = first_index[key]
+            else:
+                first_index[key] = sub.index
+                unique.append(sub)
         
-        return translated_json
+        if duplicates:
+            print(f"♻️ Deduplicated {len(duplicates)} repeated subtitles "
+                  f"({len(unique)} unique of {len(subtitles)})")
+        return unique, duplicates
     
-    def merge_timing(self, original_with_timing: Dict, translated: Dict) -> List[Dict]:
-        """Merge timing information back into translated subtitles"""
+    def merge_timing(self, original_with_timing: Dict, translated: Dict, duplicates: Dict = None) -> List[tuple]:
+        """
+        Pair every original subtitle with its translation
+        
+        Returns:
+            list: (Cue, translated text) in file order (indices are already increasing)
+        """
         print(f"🔗 Merging timing information...")
-        merged = []
-        for index in sorted(original_with_timing.keys(), key=lambda x: int(x)):
-            merged.append({
-                'index': index,
-                'time': original_with_timing[index]['time'],
-                'text': translated[index]['text']
-            })
+        duplicates = duplicates or {}
+        merged = [
+            # Repeated lines take the translation of their first occurrence
+            (sub, translated[duplicates.get(index, index)]['text'])
+            for index, sub in original_with_timing.items()
+        ]
         print(f"✅ Merged {len(merged)} subtitle entries")
         
         # Save merged result
         self.log_to_file("11_merged_final.json",
-                        json.dumps(merged, ensure_ascii=False, indent=2))
+                        lambda: json.dumps([{'index': sub.index, 'time': sub.time, 'text': text}
+                                            for sub, text in merged], ensure_ascii=False))
         
         return merged
     
-    def save_srt(self, subtitles: List[Dict], output_file: str):
-        """Save subtitles back to SRT format"""
+    def save_srt(self, subtitles: List[tuple], output_file: str):
+        """Save (Cue, text) pairs as an SRT file in one buffered write"""
         try:
+            content = "\n".join([sub.to_srt(text) for sub, text in subtitles])
             with open(output_file, 'w', encoding='utf-8') as f:
-                for i, sub in enumerate(subtitles):
-                    f.write(f"{sub['index']}\n")
-                    f.write(f"{sub['time']}\n")
-                    f.write(f"{sub['text']}\n")
-                    if i < len(subtitles) - 1:
-                        f.write("\n")
+                f.write(content)
             
             print(f"💾 Saved translated SRT: {output_file}")
             
-            # Also save to debug folder
-            self.log_to_file("12_final_output.srt",
-                           open(output_file, 'r', encoding='utf-8').read())
+            # Also save to debug folder (from memory, not by re-reading the file)
+            self.log_to_file("12_final_output.srt", content)
             
             return True
         except Exception as e:
             print(f"❌ Error saving SRT: {e}")
-            self.log_to_file("error_save_srt.txt", str(e))
+            self.log_to_file("error_save_srt.txt", str(e), level="errors")
             return False
     
-    def save_translation_log(self, original_file: str, translated: Dict):
-        """Save translation log for reuse"""
-        log_file = self.log_dir / f"{Path(original_file).stem}_translated_{self.target_language}.json"
+    def format_memory_stats(self) -> str:
+        """One-line translation memory statistics for summaries"""
+        if not self.translation_memory:
+            return "Disabled"
+        stats = self.translation_memory.stats()
+        return (f"{stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+    
+    def format_models(self, job: TranslationJob) -> str:
+        """Models that answered the job's requests, for the summary"""
+        if not job.models:
+            return "None (nothing was sent)"
+        if len(job.models) == 1:
+            return next(iter(job.models))
+        return ", ".join(f"{model} ({count} responses)"
+                         for model, count in sorted(job.models.items(), key=lambda item: -item[1]))
+    
+    def checkpoint_path(self, srt_file: str, target_language: str = None, temp_dir: Path = None) -> Path:
+        """Checkpoint journal path for this input file and translation settings, under `temp_dir` if given"""
+        digest = hashlib.sha256()
+        with open(srt_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        # Keyed by every model that may serve the chunks: a different pool starts afresh
+        settings = self.providers.models() + [self.source_language, target_language or self.target_language]
+        digest.update("\x1f".join(settings).encode('utf-8'))
+        return (temp_dir or self.temp_dir) / "checkpoints" / f"{Path(srt_file).stem}_{digest.hexdigest()[:16]}.jsonl"
+    
+    def translation_log_path(self, original_file: str, target_language: str = None, name: str = None) -> Path:
+        """Where the translation log of a source file is saved (named after `name`, by default the file's stem)"""
+        target_language = target_language or self.target_language
+        return self.log_dir / f"{name or Path(original_file).stem}_translated_{target_language}.json"
+    
+    def save_translation_log(self, original_file: str, translated: Dict, log_file: Path = None):
+        """Save translation log for reuse (to translation_log_path unless `log_file` is given)"""
+        log_file = log_file or self.translation_log_path(original_file, self.current_language())
         try:
             with open(log_file, 'w', encoding='utf-8') as f:
                 json.dump(translated, f, ensure_ascii=False, indent=2)
@@ -522,10 +2842,600 @@ Response End: {response[-500:]}
             print(f"❌ Error saving log: {e}")
             return False
     
-    def translate(self, srt_file: str, output_srt: str = None) -> bool:
+    def load_previous_translation(self, previous_log: str, previous_srt: str = None) -> List[tuple]:
+        """
+        Load an earlier version's translation as (source text, translation) pairs in order
+        
+        Logs record each cue's source text; for older logs without it, the
+        earlier source SRT (`previous_srt`) supplies the text by index.
+        """
+        try:
+            with open(previous_log, 'r', encoding='utf-8') as f:
+                log = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read previous translation {previous_log}: {e}")
+            return []
+        
+        sources = {}
+        if previous_srt:
+            sources = {sub.index: sub.text for sub in self.parse_srt(previous_srt)}
+        
+        pairs = []
+        for index in sorted(log.keys(), key=lambda x: int(x)):
+            source = log[index].get('source', sources.get(index))
+            if source is None:
+                print(f"⚠️ {previous_log} has no source text; pass the previous source SRT as well")
+                return []
+            pairs.append((source, log[index]['text']))
+        return pairs
+    
+    def align_previous_translation(self, subtitles: List[Cue], previous: List[tuple]) -> Dict:
+        """
+        Reuse translations of cues whose text is unchanged since the previous version
+        
+        The old and new sources are aligned as sequences of texts, so cues that
+        were renumbered or re-timed still match their old translation. Cues that
+        moved outside the aligned runs fall back to any old cue with the same text.
+        
+        Returns:
+            dict: {new index: {'text': translation}}
+        """
+        old_texts = [normalize_text(source) for source, _ in previous]
+        new_texts = [normalize_text(sub.text) for sub in subtitles]
+        
+        reused = {}
+        matcher = difflib.SequenceMatcher(None, old_texts, new_texts, autojunk=False)
+        for old_start, new_start, size in matcher.get_matching_blocks():
+            for offset in range(size):
+                reused[subtitles[new_start + offset].index] = {'text': previous[old_start + offset][1]}
+        aligned = len(reused)
+        
+        by_text = {}
+        for text, (_, translation) in zip(old_texts, previous):
+            by_text.setdefault(text, translation)
+        for sub, text in zip(subtitles, new_texts):
+            if sub.index not in reused and text in by_text:
+                reused[sub.index] = {'text': by_text[text]}
+        
+        changed = len(subtitles) - len(reused)
+        print(f"🔁 Previous version: {aligned} cues aligned, {len(reused) - aligned} moved, "
+              f"{changed} changed or new ({changed / max(len(subtitles), 1):.1%} to translate)")
+        self.metrics.incr("reused_cues", len(reused))
+        
+        self.log_to_file("02_incremental_alignment.json", lambda: json.dumps({
+            "aligned": aligned,
+            "moved": len(reused) - aligned,
+            "to_translate": [sub.index for sub in subtitles if sub.index not in reused]
+        }, ensure_ascii=False))
+        return reused
+    
+    def build_glossary_prompt(self, sample: List[str], target_language: str) -> str:
+        """Build the pre-pass prompt that extracts names, recurring terms and a synopsis"""
+        lines = "\n".join(' '.join(text.split()) for text in sample)
+        
+        return f"""Build a glossary for translating these {self.source_language} subtitles into {target_language}. They are sampled from the whole video (or series), in order.
+
+Return ONLY valid JSON (no markdown): {{"synopsis": "<story, main characters and tone in at most 3 sentences>", "terms": {{"<name or term>": "<{target_language} rendering>", ...}}}}
+- terms: up to {GLOSSARY_MAX_TERMS} character names, places, nicknames, titles and recurring phrases or jargon that must be rendered the same way every time, most important first
+- Leave out ordinary words that need no fixed translation
+- Write the synopsis in {self.source_language}
+
+Subtitles:
+{lines}"""
+    
+    def glossary_cache_path(self, prompt: str, model: str) -> Path:
+        """Cache file of the glossary `model` built from this pre-pass prompt"""
+        digest = hashlib.sha256("\x1f".join([model, prompt]).encode('utf-8')).hexdigest()
+        return self.glossary_dir / f"{digest[:32]}.json"
+    
+    def load_glossary(self, texts, label: str):
+        """
+        Glossary of a file or series, from the cache or from one pre-pass request
+        
+        Args:
+            texts: Subtitle texts in order (any iterable; only a sample is kept)
+            label: File or folder name for progress messages
+        
+        Returns:
+            Glossary, or None if the pre-pass failed (chunks then go without one)
+        """
+        target_language = self.current_language()
+        sample = sample_texts(texts, GLOSSARY_SAMPLE_TOKENS)
+        if not sample:
+            return None
+        
+        # The prompt holds the sample, languages and limits, so it identifies the glossary
+        prompt = self.build_glossary_prompt(sample, target_language)
+        glossary = None
+        for model in self.providers.models():
+            try:
+                with open(self.glossary_cache_path(prompt, model), 'r', encoding='utf-8') as f:
+                    glossary = Glossary.from_dict(json.load(f), GLOSSARY_MAX_TERMS, cached=True)
+            except (OSError, ValueError):
+                continue
+            if glossary:
+                break
+        if glossary:
+            print(f"📚 Glossary for {label} ({target_language}): {len(glossary.terms)} terms (cached)")
+            self.metrics.incr("glossaries", result="cached")
+            return glossary
+        
+        print(f"📚 Building glossary for {label} ({target_language}) from {len(sample)} sampled subtitles...")
+        self._local.json_response = True
+        try:
+            with self.metrics.timer("glossary"):
+                response, model = self.call_ai_api(prompt, "_glossary_",
+                                                   response_tokens=GLOSSARY_MAX_TERMS * 15 + 150)
+        finally:
+            self._local.json_response = False
+        
+        data = None
+        start = response.find('{')
+        if start >= 0:
+            try:
+                data, _ = json.JSONDecoder().raw_decode(response, start)
+            except ValueError:
+                pass
+        glossary = Glossary.from_dict(data, GLOSSARY_MAX_TERMS)
+        if not glossary:
+            print(f"⚠️ No glossary for {label} - its chunks are translated without one")
+            self.metrics.incr("glossaries", result="failed")
+            return None
+        
+        print(f"📚 Glossary for {label} ({target_language}): {len(glossary.terms)} terms")
+        self.metrics.incr("glossaries", result="built")
+        path = self.glossary_cache_path(prompt, model)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(dict(glossary.to_dict(), source=label, language=target_language),
+                          f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not cache glossary: {e}")
+        return glossary
+    
+    def fits_one_chunk(self, subtitles) -> bool:
+        """Whether these subtitles fit the budgets of a single chunk"""
+        if not self.enable_chunking:
+            return True
+        count = prompt_tokens = response_tokens = 0
+        for sub in subtitles:
+            cost = self.estimate_subtitle_tokens(sub)
+            count += 1
+            prompt_tokens += cost[0]
+            response_tokens += cost[1]
+        return (count <= self.max_chunk_size and prompt_tokens <= CHUNK_INPUT_TOKEN_BUDGET
+                and response_tokens <= self.chunk_output_budget())
+    
+    def prepare_glossaries(self, jobs: List[TranslationJob]):
+        """
+        Glossary pre-pass: one glossary per file (or folder, see GLOSSARY_SCOPE) and language
+        
+        A lone file that fits in a single chunk's token budgets needs none,
+        since that chunk already sees the whole file. Glossaries are built in
+        parallel before any chunk is sent (or cut).
+        """
+        groups = {}
+        for job in jobs:
+            if not job.plan:
+                continue
+            scope = Path(job.srt_file).parent if GLOSSARY_SCOPE == "folder" else Path(job.srt_file)
+            groups.setdefault((scope, job.target_language), []).append(job)
+        groups = [group for group in groups.values()
+                  if len(group) > 1 or not self.fits_one_chunk(group[0].original_with_timing.values())]
+        if not groups:
+            return
+        
+        def build(group):
+            with self.job_context(group[0]):
+                label = Path(group[0].srt_file).name
+                if len(group) > 1:
+                    label = f"{Path(group[0].srt_file).parent.name or '.'}/ ({len(group)} files)"
+                texts = (sub.text for job in group for sub in job.original_with_timing.values())
+                glossary = self.load_glossary(texts, label)
+                if glossary:
+                    self.log_to_file("02_glossary.json",
+                                     lambda: json.dumps(glossary.to_dict(), ensure_ascii=False, indent=2))
+            for job in group:
+                job.glossary = glossary
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_chunks) as executor:
+            list(executor.map(build, groups))
+    
+    def prepare_job(self, srt_file: str, output_srt: str, log_dir: Path,
+                    previous_log: str = None, previous_srt: str = None, name: str = None):
+        """
+        Parse, deduplicate and chunk one file, ready for the scheduler
+        
+        With `previous_log` (the translation log of an earlier version of the
+        file), unchanged cues reuse their old translation and only changed or
+        new cues are chunked for the API.
+        
+        Returns:
+            TranslationJob, or None if the file could not be prepared
+        """
+        jobs = self.prepare_jobs(srt_file, {self.target_language: output_srt}, log_dir,
+                                 {self.target_language: previous_log}, previous_srt, name=name)
+        return jobs[0] if jobs else None
+    
+    def prepare_jobs(self, srt_file: str, outputs: Dict[str, str], log_dir: Path,
+                     previous_logs: Dict[str, str] = None, previous_srt: str = None,
+                     temp_dir: Path = None, name: str = None) -> List[TranslationJob]:
+        """
+        Prepare one job per target language from a single parse of the file
+        
+        Each language gets its own output, checkpoint and failure state, while
+        the parsed subtitles and duplicate map are shared. Languages with the
+        same subtitles left to translate (normally all of them) share one
+        chunk plan.
+        
+        Args:
+            outputs: {target language: output SRT path}
+            previous_logs: {target language: translation log of an earlier version}
+            temp_dir: Where the timing JSON and checkpoints are kept (default:
+                      the translator's temp_dir, shared by every file)
+            name: What the timing JSON and translation logs are named after
+                  (default: the file's stem)
+        
+        Returns:
+            list of TranslationJob (empty if the file could not be prepared)
+        """
+        languages = list(outputs)
+        fan_out = len(languages) > 1
+        previous_logs = previous_logs or {}
+        shared = TranslationJob(srt_file, outputs[languages[0]], log_dir, languages[0])
+        
+        with self.job_context(shared):
+            # Parse SRT
+            print(f"{'─'*70}")
+            print(f"STEP 1: PARSING SRT FILE")
+            print(f"{'─'*70}")
+            with self.metrics.timer("parse"):
+                subtitles = self.parse_srt(srt_file)
+            if not subtitles:
+                print("❌ Failed to parse SRT file")
+                return []
+            
+            # Save full JSON with timing
+            print(f"\n{'─'*70}")
+            print(f"STEP 2: SAVING JSON WITH TIMING")
+            print(f"{'─'*70}")
+            json_with_timing_file = f"{name or Path(srt_file).stem}_with_timing.json"
+            shared.original_with_timing = self.save_json_with_timing(subtitles, json_with_timing_file, temp_dir)
+            if not shared.original_with_timing:
+                print("❌ Failed to save JSON with timing")
+                return []
+            
+            # Collapse repeated lines into a single translation slot
+            unique = subtitles
+            if self.enable_deduplication:
+                unique, shared.duplicates = self.deduplicate_subtitles(subtitles)
+        
+        jobs = []
+        plans = {}  # Indices left to translate -> chunk plan
+        for language in languages:
+            job = shared
+            if fan_out:
+                # Each language logs into its own debug folder
+                job = TranslationJob(srt_file, outputs[language], log_dir / language, language)
+                job.original_with_timing = shared.original_with_timing
+                job.duplicates = shared.duplicates
+            job.translation_log = self.translation_log_path(srt_file, language, name)
+            
+            with self.job_context(job):
+                if fan_out:
+                    print(f"\n🌍 {self.source_language} → {language}: {outputs[language]}")
+                
+                # Reuse the earlier version's translation of unchanged cues
+                if previous_logs.get(language):
+                    previous = self.load_previous_translation(previous_logs[language], previous_srt)
+                    if previous:
+                        job.completed = self.align_previous_translation(subtitles, previous)
+                        job.reused = len(job.completed)
+                
+                # Resume from the checkpoint of an earlier, interrupted run
+                if self.enable_checkpoints:
+                    job.checkpoint = CheckpointJournal(self.checkpoint_path(srt_file, language, temp_dir))
+                    restored = job.checkpoint.load()
+                    if restored:
+                        print(f"♻️ Resuming from checkpoint: {len(restored)} subtitles already translated")
+                    job.completed.update(restored)
+                pending = unique
+                if job.completed:
+                    pending = [sub for sub in unique if sub.index not in job.completed]
+                
+                # Chunks are cut as workers free up, so they follow the adaptive chunk size
+                total_subtitles = len(pending)
+                plan_key = tuple(sub.index for sub in pending)
+                if plan_key not in plans:
+                    plans[plan_key] = None
+                    if pending:
+                        plans[plan_key] = ChunkPlan(self.iter_chunks(pending) if self.enable_chunking else [pending])
+                job.plan = plans[plan_key]
+                job.pending_count = total_subtitles
+                
+                if not job.plan:
+                    print(f"✅ Nothing left to translate")
+                else:
+                    print(f"\n{'─'*70}")
+                    print(f"STEP 3: TRANSLATING {total_subtitles} SUBTITLES")
+                    print(f"{'─'*70}")
+                    if self.enable_chunking:
+                        print(f"📦 Chunks of up to ~{self.chunk_output_budget()} response tokens"
+                              + (" (adjusted as responses come back)" if self.chunk_sizer else ""))
+            jobs.append(job)
+        
+        return jobs
+    
+    def schedule_chunks(self, jobs: List[TranslationJob]):
+        """
+        Order the chunks of all jobs for the shared worker pool
+        
+        Files with fewer subtitles go first and files take turns, so small files
+        finish early instead of waiting behind large ones. Chunks are only cut
+        when a worker is ready for them.
+        """
+        ordered = sorted((job for job in jobs if job.plan), key=lambda job: job.pending_count)
+        chunk_num = 0
+        while ordered:
+            for job in list(ordered):
+                chunk = None if job.failed else job.plan.get(chunk_num)
+                if chunk is None:
+                    ordered.remove(job)
+                    continue
+                job.chunks.append(chunk)
+                job.planned = job.plan.get(chunk_num + 1) is None
+                job.remaining += 1
+                yield job, chunk_num
+            chunk_num += 1
+    
+    def run_jobs(self, jobs: List[TranslationJob]):
+        """
+        Translate the chunks of every job through one bounded worker pool
+        
+        Each job's output is written as soon as its last chunk lands. A failed
+        chunk fails only its own job; the rest of that job's chunks are skipped.
+        """
+        # Jobs fully restored from checkpoints have nothing to send
+        for job in jobs:
+            if not job.plan:
+                job.planned = True
+                self.finalize_job_safely(job)
+        
+        tasks = self.schedule_chunks(jobs)
+        total_subtitles = sum(job.pending_count for job in jobs if job.plan)
+        if not total_subtitles:
+            return
+        
+        if self.enable_glossary:
+            self.prepare_glossaries(jobs)
+        
+        workers = self.max_concurrent_chunks
+        print(f"⚡ Translating {total_subtitles} subtitles with up to {workers} worker(s)")
+        
+        in_flight = {}
+        # Every chunk can be sent from here on; queue_wait is how long it waits for a worker
+        ready_at = time.perf_counter()
+        
+        def submit_next(executor) -> bool:
+            for job, chunk_num in tasks:
+                if job.failed:
+                    continue
+                future = executor.submit(self.run_chunk, job, chunk_num, ready_at)
+                in_flight[future] = (job, chunk_num)
+                return True
+            return False
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Chunks are pulled lazily so a failed job stops consuming workers
+            for _ in range(workers):
+                if not submit_next(executor):
+                    break
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, chunk_num = in_flight.pop(future)
+                    self.complete_chunk(job, chunk_num, future)
+                    submit_next(executor)
+        
+        if self.chunk_sizer:
+            self.chunk_sizer.save()
+        self.export_metrics()
+    
+    def run_chunk(self, job: TranslationJob, chunk_num: int, ready_at: float = None) -> Dict:
+        """Worker entry point: translate one chunk of a job"""
+        with self.job_context(job):
+            if ready_at is not None:
+                self.metrics.observe("queue_wait", time.perf_counter() - ready_at,
+                                     chunk=f"chunk{chunk_num+1}")
+            # The chunk count is only known once the last chunk has been cut
+            return self.translate_chunk(job.chunks[chunk_num], chunk_num, len(job.chunks) if job.planned else 0)
+    
+    def complete_chunk(self, job: TranslationJob, chunk_num: int, future):
+        """Collect a finished chunk, finalizing its job after the last one"""
+        total_chunks = len(job.chunks) if job.planned else 0
+        job.remaining -= 1
+        try:
+            translated_chunk = future.result()
+        except Exception as e:
+            print(f"❌ Chunk {chunk_num+1} of {job.srt_file} raised an error: {e}")
+            with self.job_context(job):
+                self.log_to_file(f"exception_chunk{chunk_num+1}of{total_chunks or 'N'}.txt",
+                               f"Exception: {str(e)}\n{type(e)}", level="errors")
+            translated_chunk = {}
+        
+        if not translated_chunk:
+            if not job.failed:
+                print(f"❌ Chunk {chunk_num+1} of {job.srt_file} translation failed")
+                job.failed = True
+            return
+        
+        # Kept even when another chunk has failed the job: a resumed run need not pay for it again
+        job.results[chunk_num] = translated_chunk
+        if job.checkpoint:
+            job.checkpoint.record(translated_chunk)
+        if job.failed:
+            return
+        if job.on_progress:
+            job.on_progress(job)
+        if total_chunks != 1:
+            print(f"✅ Chunk {chunk_num+1}/{total_chunks or '?'} complete ({job.srt_file})")
+        
+        if job.planned and job.remaining == 0:
+            self.finalize_job_safely(job)
+    
+    def finalize_job_safely(self, job: TranslationJob):
+        """Finalize a job; one file's broken output must not take down the other jobs"""
+        try:
+            self.finalize_job(job)
+        except Exception as e:
+            print(f"❌ Could not finalize {job.srt_file}: {e}")
+            job.failed = True
+    
+    def finalize_job(self, job: TranslationJob) -> bool:
+        """Merge timing and save the output, logs and summary of a finished job"""
+        with self.job_context(job):
+            translated_json = {}
+            for translated_chunk in job.results.values():
+                translated_json.update(translated_chunk)
+            translated_json.update(job.completed)
+            
+            # Merge timing back
+            print(f"\n{'─'*70}")
+            print(f"FINAL STEP: MERGING AND SAVING")
+            print(f"{'─'*70}")
+            with self.metrics.timer("merge"):
+                final_subtitles = self.merge_timing(job.original_with_timing, translated_json, job.duplicates)
+            
+            # Save translated SRT
+            Path(job.output_srt).parent.mkdir(parents=True, exist_ok=True)
+            with self.metrics.timer("save"):
+                saved = self.save_srt(final_subtitles, job.output_srt)
+            if not saved:
+                print("❌ Failed to save translated SRT")
+                job.failed = True
+                return False
+            
+            # Save translation log (every index, including duplicates, with its source for later revisions)
+            self.save_translation_log(job.srt_file, {
+                sub.index: {'text': text, 'source': sub.text}
+                for sub, text in final_subtitles
+            }, job.translation_log)
+            
+            # The output is safely written, so the checkpoint is no longer needed
+            if job.checkpoint:
+                job.checkpoint.remove()
+            
+            job.success = True
+            
+            print(f"\n{'='*70}")
+            print(f"🎉 TRANSLATION COMPLETE!")
+            print(f"{'='*70}")
+            print(f"✅ Translated {len(final_subtitles)} subtitle entries")
+            print(f"✅ Output saved: {job.output_srt}")
+            print(f"🧠 Translation memory: {self.format_memory_stats()}")
+            print(f"📁 Debug logs: {job.log_dir}")
+            print(f"{'='*70}\n")
+            
+            # Create summary file
+            summary = f"""Translation Summary
+==================
+Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Input: {job.srt_file}
+Output: {job.output_srt}
+Total Subtitles: {len(final_subtitles)}
+Source Language: {self.source_language}
+Target Language: {job.target_language}
+Model: {self.format_models(job)}
+Prompt Mode: {self.prompt_mode}
+Response Format: {'lines' if self.uses_line_format() else 'json'}
+Chunking: {'Yes' if len(job.chunks) > 1 else 'No'}
+Glossary: {f"{len(job.glossary.terms)} terms" + (" (cached)" if job.glossary.cached else "") if job.glossary else 'None'}
+Deduplicated: {len(job.duplicates)} repeated subtitles
+Reused From Previous Version: {job.reused} subtitles
+Resumed From Checkpoint: {len(job.completed) - job.reused} subtitles
+Translation Memory: {self.format_memory_stats()}
+Duration: {time.monotonic() - job.started:.1f} seconds
+Metrics: {self.metrics.jsonl_path if ENABLE_METRICS else 'Disabled'}
+Status: SUCCESS ✅
+"""
+            self.log_to_file("SUMMARY.txt", summary, level="summary")
+        
+        return True
+    
+    def translate(self, srt_file: str, output_srt: str = None,
+                  previous_log=None, previous_srt: str = None,
+                  target_languages: List[str] = None) -> bool:
         """
         Main translation workflow
         
+        Args:
+            srt_file: Input SRT file path
+            output_srt: Output SRT file path (optional). With several target
+                        languages, "{language}" in it is replaced by each
+                        language, otherwise the language is appended
+            previous_log: Translation log of an earlier version of this file;
+                          only changed or new cues are translated (optional).
+                          With several languages, a {language: log} dict
+            previous_srt: Earlier source SRT, for logs that predate source text
+                          being recorded (optional)
+            target_languages: Translate into each of these languages from one
+                              parse and chunk plan (optional, defaults to
+                              the translator's target language)
+        
+        Returns:
+            bool: True if translation successful (into every language), False otherwise
+        """
+        languages = target_languages or [self.target_language]
+        if len(languages) == 1:
+            outputs = {languages[0]: output_srt or self.default_output_path(srt_file, languages[0])}
+            previous_logs = {languages[0]: previous_log}
+        else:
+            outputs = {
+                language: self.language_output_path(output_srt, language) if output_srt
+                else self.default_output_path(srt_file, language)
+                for language in languages
+            }
+            previous_logs = previous_log or {}
+        
+        print(f"\n{'='*70}")
+        print(f"🎯 STARTING TRANSLATION PROCESS")
+        print(f"{'='*70}")
+        print(f"📥 Input:  {srt_file}")
+        for language, output in outputs.items():
+            print(f"📤 Output: {output}" + (f" ({language})" if len(outputs) > 1 else ""))
+        print(f"📁 Debug:  {self.session_dir}")
+        print(f"{'='*70}\n")
+        
+        jobs = self.prepare_jobs(srt_file, outputs, self.session_dir, previous_logs, previous_srt)
+        if not jobs:
+            return False
+        
+        self.run_jobs(jobs)
+        
+        if len(jobs) > 1:
+            print(f"\n{'='*70}")
+            print(f"🌍 LANGUAGES COMPLETE: {sum(1 for job in jobs if job.success)}/{len(jobs)} translated")
+            for job in jobs:
+                print(f"   {'✅' if job.success else '❌'} {job.target_language}: {job.output_srt}")
+            print(f"{'='*70}\n")
+        
+        return all(job.success for job in jobs)
+    
+    def translate_stream(self, srt_file: str, output_srt: str = None) -> bool:
+        """
+        Translate a very large SRT file with bounded memory
+        
+        Subtitles are parsed lazily, packed into chunks on the fly and written
+        to the output in order as soon as a contiguous run of chunks is done.
+        Only the chunks in flight (and those waiting for an earlier chunk) are
+        held in memory. Deduplication and the JSON/translation log files need
+        the whole file, so they are skipped in this mode; the translation
+        memory and checkpoints still apply.
+        
         Args:
             srt_file: Input SRT file path
             output_srt: Output SRT file path (optional)
@@ -534,108 +3444,198 @@ Response End: {response[-500:]}
             bool: True if translation successful, False otherwise
         """
         if output_srt is None:
-            output_srt = str(Path(srt_file).stem) + f"_{self.target_language.lower()}.srt"
+            output_srt = self.default_output_path(srt_file)
         
         print(f"\n{'='*70}")
-        print(f"🎯 STARTING TRANSLATION PROCESS")
+        print(f"🌊 STARTING STREAMING TRANSLATION")
         print(f"{'='*70}")
         print(f"📥 Input:  {srt_file}")
         print(f"📤 Output: {output_srt}")
-        print(f"📁 Debug:  {self.session_dir}")
         print(f"{'='*70}\n")
         
-        # Parse SRT
-        print(f"{'─'*70}")
-        print(f"STEP 1: PARSING SRT FILE")
-        print(f"{'─'*70}")
-        subtitles = self.parse_srt(srt_file)
-        if not subtitles:
-            print("❌ Failed to parse SRT file")
-            return False
+        job = TranslationJob(srt_file, output_srt, self.session_dir, self.target_language)
+        # Only where each checkpointed subtitle is stored is kept; the text is read per chunk
+        restorable = {}
+        if self.enable_checkpoints:
+            job.checkpoint = CheckpointJournal(self.checkpoint_path(srt_file, job.target_language))
+            restorable = job.checkpoint.load_offsets()
+            if restorable:
+                print(f"♻️ Resuming from checkpoint: {len(restorable)} subtitles already translated")
         
-        # Save full JSON with timing
-        print(f"\n{'─'*70}")
-        print(f"STEP 2: SAVING JSON WITH TIMING")
-        print(f"{'─'*70}")
-        json_with_timing_file = f"{Path(srt_file).stem}_with_timing.json"
-        original_with_timing = self.save_json_with_timing(subtitles, json_with_timing_file)
-        if not original_with_timing:
-            print("❌ Failed to save JSON with timing")
-            return False
+        # The glossary pre-pass reads the file once more, keeping only a sample
+        if self.enable_glossary:
+            with self.job_context(job):
+                job.glossary = self.load_glossary((sub.text for sub in self.iter_srt(srt_file)),
+                                                  Path(srt_file).name)
         
-        # Decide whether to chunk
-        total_subtitles = len(subtitles)
-        should_chunk = self.enable_chunking and total_subtitles > self.max_chunk_size
+        chunks = enumerate(self.iter_chunks(self.iter_srt(srt_file)))
+        window = self.max_concurrent_chunks * 2  # Chunks in flight or waiting to be written
+        in_flight = {}
+        finished = {}
+        next_to_write = 0
+        written = 0
         
-        if should_chunk:
-            print(f"\n{'─'*70}")
-            print(f"📦 CHUNKING ENABLED: {total_subtitles} subtitles > {self.max_chunk_size} limit")
-            print(f"{'─'*70}")
-            
-            chunks = []
-            for i in range(0, total_subtitles, self.max_chunk_size):
-                chunks.append(subtitles[i:i + self.max_chunk_size])
-            
-            print(f"📦 Created {len(chunks)} chunks")
-            
-            # Translate each chunk
-            all_translated = {}
-            for i, chunk in enumerate(chunks):
-                translated_chunk = self.translate_chunk(chunk, i, len(chunks))
-                if not translated_chunk:
-                    print(f"❌ Chunk {i+1} translation failed")
-                    return False
-                all_translated.update(translated_chunk)
-                print(f"✅ Chunk {i+1}/{len(chunks)} complete")
-            
-            translated_json = all_translated
-            
-        else:
-            print(f"\n{'─'*70}")
-            print(f"STEP 3: TRANSLATING (SINGLE PASS)")
-            print(f"{'─'*70}")
-            translated_json = self.translate_chunk(subtitles)
-            if not translated_json:
-                return False
+        def submit_next(executor) -> bool:
+            for chunk_num, chunk in chunks:
+                indices = [sub.index for sub in chunk]
+                if all(index in restorable for index in indices):
+                    # Already translated in an earlier run; it still takes a place in the window
+                    finished[chunk_num] = (chunk, job.checkpoint.read(indices, restorable))
+                    return True
+                future = executor.submit(self.run_stream_chunk, job, chunk, chunk_num)
+                in_flight[future] = (chunk_num, chunk)
+                return True
+            return False
         
-        # Merge timing back
-        print(f"\n{'─'*70}")
-        print(f"FINAL STEP: MERGING AND SAVING")
-        print(f"{'─'*70}")
-        final_subtitles = self.merge_timing(original_with_timing, translated_json)
+        partial_output = Path(f"{output_srt}.part")
+        Path(output_srt).parent.mkdir(parents=True, exist_ok=True)
+        
+        with open(partial_output, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.max_concurrent_chunks) as executor:
+            more_chunks = True
+            while True:
+                # Keep the window full, but never run too far ahead of the writer
+                while more_chunks and len(in_flight) + len(finished) < window and not job.failed:
+                    more_chunks = submit_next(executor)
+                
+                # Write every chunk that continues the already written prefix
+                while next_to_write in finished:
+                    chunk, translated = finished.pop(next_to_write)
+                    for sub in chunk:
+                        if written:
+                            out.write("\n")
+                        out.write(sub.to_srt(translated[sub.index]['text']))
+                        written += 1
+                    out.flush()
+                    next_to_write += 1
+                
+                if not in_flight:
+                    # Restored chunks alone may have filled the window
+                    if more_chunks and not job.failed:
+                        continue
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_num, chunk = in_flight.pop(future)
+                    try:
+                        translated = future.result()
+                    except Exception as e:
+                        print(f"❌ Chunk {chunk_num+1} raised an error: {e}")
+                        translated = {}
+                    
+                    if not translated:
+                        print(f"❌ Chunk {chunk_num+1} translation failed")
+                        job.failed = True
+                        continue
+                    
+                    if job.checkpoint:
+                        job.checkpoint.record(translated)
+                    finished[chunk_num] = (chunk, translated)
+                    print(f"✅ Chunk {chunk_num+1} complete ({written} subtitles written so far)")
         
-        # Save translated SRT
-        if not self.save_srt(final_subtitles, output_srt):
-            print("❌ Failed to save translated SRT")
+        if job.failed:
+            print(f"❌ Streaming translation failed after {written} subtitles; "
+                  f"finished chunks are kept in the checkpoint")
             return False
         
-        # Save translation log
-        self.save_translation_log(srt_file, translated_json)
+        self.export_metrics()
+        os.replace(partial_output, output_srt)
+        if job.checkpoint:
+            job.checkpoint.remove()
         
         print(f"\n{'='*70}")
-        print(f"🎉 TRANSLATION COMPLETE!")
+        print(f"🎉 STREAMING TRANSLATION COMPLETE!")
         print(f"{'='*70}")
-        print(f"✅ Translated {len(final_subtitles)} subtitle entries")
+        print(f"✅ Translated {written} subtitle entries")
         print(f"✅ Output saved: {output_srt}")
-        print(f"📁 Debug logs: {self.session_dir}")
+        print(f"🧠 Translation memory: {self.format_memory_stats()}")
         print(f"{'='*70}\n")
+        return True
+    
+    def run_stream_chunk(self, job: TranslationJob, chunk: List[Cue], chunk_num: int) -> Dict:
+        """Worker entry point for streaming mode (the total chunk count is unknown)"""
+        # Chunks are only read once a worker is free, so there is no queue wait to record
+        with self.job_context(job):
+            return self.translate_chunk(chunk, chunk_num, total_chunks=0)
+    
+    def translate_batch(self, input_dir: str, output_dir: str = None,
+                        incremental: bool = False) -> Dict[str, bool]:
+        """
+        Translate every SRT file under a directory tree with one shared scheduler
         
-        # Create summary file
-        summary = f"""Translation Summary
-==================
-Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Input: {srt_file}
-Output: {output_srt}
-Total Subtitles: {len(final_subtitles)}
-Source Language: {self.source_language}
-Target Language: {self.target_language}
-Model: {self.model_name}
-Chunking: {'Yes' if should_chunk else 'No'}
-Status: SUCCESS ✅
-"""
-        self.log_to_file("SUMMARY.txt", summary)
+        Args:
+            input_dir: Directory searched recursively for *.srt files
+            output_dir: Where to write outputs, mirroring the input tree
+                        (optional, defaults to next to each input file)
+            incremental: Reuse each file's existing translation log, translating
+                         only cues that changed since then
         
-        return True
+        Returns:
+            dict: {input file: True if translated successfully}
+        """
+        input_root = Path(input_dir)
+        suffix = f"_{self.target_language.lower()}"
+        srt_files = sorted(
+            path for path in input_root.rglob("*.srt")
+            if not path.stem.endswith(suffix)  # Skip outputs of earlier runs
+        )
+        
+        print(f"\n{'='*70}")
+        print(f"📚 BATCH TRANSLATION: {len(srt_files)} files under {input_root}")
+        print(f"{'='*70}\n")
+        
+        results = {}
+        jobs = []
+        for path in srt_files:
+            relative = path.relative_to(input_root)
+            if output_dir:
+                output_srt = Path(output_dir) / relative.parent / f"{path.stem}{suffix}.srt"
+            else:
+                output_srt = path.with_name(f"{path.stem}{suffix}.srt")
+            
+            # Named by the path under input_dir, so S01/E01.srt and S02/E01.srt keep separate logs
+            name = "_".join(relative.with_suffix("").parts)
+            log_dir = self.session_dir / name
+            previous_log = self.translation_log_path(path, name=name) if incremental else None
+            if previous_log and not previous_log.exists():
+                previous_log = None
+            job = self.prepare_job(str(path), str(output_srt), log_dir, previous_log, name=name)
+            if job is None:
+                results[str(path)] = False
+            else:
+                jobs.append(job)
+        
+        self.run_jobs(jobs)
+        for job in jobs:
+            results[job.srt_file] = job.success
+        
+        succeeded = sum(1 for ok in results.values() if ok)
+        print(f"\n{'='*70}")
+        print(f"📚 BATCH COMPLETE: {succeeded}/{len(results)} files translated")
+        for srt_file, ok in results.items():
+            if not ok:
+                print(f"   ❌ {srt_file}")
+        print(f"{'='*70}\n")
+        
+        return results
+    
+    def default_output_path(self, srt_file: str, target_language: str = None) -> str:
+        """Default output file name for an input file"""
+        target_language = target_language or self.target_language
+        return str(Path(srt_file).stem) + f"_{target_language.lower()}.srt"
+    
+    def language_output_path(self, output_srt: str, target_language: str) -> str:
+        """
+        Output path for one of several target languages
+        
+        A "{language}" placeholder is filled in; otherwise the language is
+        appended to the file name (movie_fa.srt -> movie_fa_arabic.srt).
+        """
+        if "{language}" in output_srt:
+            return output_srt.replace("{language}", target_language.lower())
+        path = Path(output_srt)
+        return str(path.with_name(f"{path.stem}_{target_language.lower()}{path.suffix}"))
 
 
 # =========================================================================
@@ -644,6 +3644,33 @@ Status: SUCCESS ✅
 
 def main():
     """Main function to run the translator"""
+    parser = argparse.ArgumentParser(description="Translate SRT subtitles with AI")
+    parser.add_argument("input", nargs="?", default="input.srt",
+                        help="Input SRT file (default: input.srt)")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="Output SRT file (default: output_persian.srt; with several --languages, "
+                             "<input>_<language>.srt, or a path containing {language})")
+    parser.add_argument("--stream", action="store_true",
+                        help="Bounded-memory mode for very large files")
+    parser.add_argument("--batch", metavar="DIR",
+                        help="Translate every .srt file under DIR (recursively)")
+    parser.add_argument("--output-dir", metavar="DIR",
+                        help="Batch mode: write outputs here, mirroring the input tree")
+    parser.add_argument("--languages", nargs="+", metavar="LANGUAGE",
+                        help=f"Target languages, translated from one shared parse (default: {TARGET_LANGUAGE})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Translate only cues changed since the last translation of the same file name")
+    parser.add_argument("--previous-log", metavar="JSON",
+                        help="Translation log of an earlier version; translate only changed or new cues")
+    parser.add_argument("--previous-source", metavar="SRT",
+                        help="Earlier source SRT, for translation logs that do not record source text")
+    args = parser.parse_args()
+    
+    if args.stream and (args.incremental or args.previous_log):
+        parser.error("--stream cannot be combined with incremental translation")
+    languages = args.languages or [TARGET_LANGUAGE]
+    if len(languages) > 1 and (args.stream or args.batch or args.previous_log):
+        parser.error("several --languages cannot be combined with --stream, --batch or --previous-log")
     
     # Check API key
     if API_KEY == "your-api-key-here":
@@ -652,20 +3679,50 @@ def main():
         print("!"*70 + "\n")
         return
     
-    # Create translator instance
-    translator = SRTTranslator()
+    # Create translator instance (streaming and batch mode translate into its target language)
+    translator = SRTTranslator(target_language=languages[0])
+    
+    if args.batch:
+        try:
+            results = translator.translate_batch(args.batch, args.output_dir, args.incremental)
+        finally:
+            translator.close()
+        failed = sum(1 for ok in results.values() if not ok)
+        print(f"{'✅' if not failed else '❌'} Batch finished: {len(results) - failed} succeeded, {failed} failed")
+        print(f"📁 Debug logs: debug_logs/{translator.session_id}/")
+        return
     
-    # Example usage
-    input_file = "input.srt"
-    output_file = "output_persian.srt"
+    input_file = args.input
+    output_file = args.output
+    if output_file is None and not args.languages:
+        output_file = "output_persian.srt"
     
     if not Path(input_file).exists():
         print(f"❌ Input file not found: {input_file}")
         print(f"💡 Please place your SRT file in the same directory as this script")
+        translator.close()
         return
     
+    previous_logs = {languages[0]: args.previous_log}
+    if args.incremental and not args.previous_log:
+        for language in languages:
+            previous_logs[language] = translator.translation_log_path(input_file, language)
+            if not previous_logs[language].exists():
+                print(f"ℹ️ No previous translation at {previous_logs[language]}, translating everything")
+                previous_logs[language] = None
+    
     # Perform translation
-    success = translator.translate(input_file, output_file)
+    try:
+        if args.stream:
+            success = translator.translate_stream(input_file, output_file)
+        elif len(languages) > 1:
+            success = translator.translate(input_file, output_file, previous_logs, args.previous_source,
+                                           target_languages=languages)
+        else:
+            success = translator.translate(input_file, output_file, previous_logs[languages[0]],
+                                           args.previous_source, target_languages=languages)
+    finally:
+        translator.close()
     
     if success:
         print("✅ All done! Check your output file.")